@@ -9,16 +9,22 @@ from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_migrate import Migrate
-import resend
-import stripe
 
 from .pages import pages_bp
+from . import compression, db_routing, filecache, logs, outbound
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": db_routing.RoutingSession})
 jwt = JWTManager()
 limiter = Limiter(key_func=get_remote_address, default_limits=["200 per hour"])
 migrate = Migrate()  # <- create globally
 
+def _default_forms_path(app) -> str:
+    """config/forms.json next to the app (Docker image), else the app's own copy in Frontend/."""
+    shipped = os.path.abspath(os.path.join(app.root_path, "..", "config", "forms.json"))
+    if os.path.isfile(shipped):
+        return shipped
+    return os.path.abspath(os.path.join(app.root_path, "..", "..", "Frontend", "config", "forms.json"))
+
 def create_app():
     app = Flask(__name__, instance_relative_config=True)
 
@@ -31,23 +37,87 @@ def create_app():
         SECRET_KEY=os.getenv("SECRET_KEY"),
         JWT_SECRET_KEY=os.getenv("JWT_SECRET_KEY"),
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
-        SQLALCHEMY_DATABASE_URI="sqlite:///" + os.path.join(app.instance_path, "app.db"),
+        SQLALCHEMY_DATABASE_URI=os.getenv("DATABASE_URL", "sqlite:///" + os.path.join(app.instance_path, "app.db")),
+        SQLALCHEMY_READ_DATABASE_URI=os.getenv("SQLALCHEMY_READ_DATABASE_URI"),  # e.g. a PostgreSQL replica
+        DB_READ_ROUTING=os.getenv("DB_READ_ROUTING", "1") == "1",
+        DB_READ_POOL_SIZE=int(os.getenv("DB_READ_POOL_SIZE", "10")),
+        DB_POOL_SIZE=int(os.getenv("DB_POOL_SIZE", "0")) or None,  # None = SQLAlchemy's default (5)
+        SQLITE_WAL=os.getenv("SQLITE_WAL", "1") == "1",
         RESEND_API_KEY=os.getenv("RESEND_API_KEY"),
+        OUTBOUND_POOL_SIZE=int(os.getenv("OUTBOUND_POOL_SIZE", "10")),  # keep-alive connections per provider
+        STRIPE_CONNECT_TIMEOUT=float(os.getenv("STRIPE_CONNECT_TIMEOUT", "3")),
+        STRIPE_READ_TIMEOUT=float(os.getenv("STRIPE_READ_TIMEOUT", "20")),
+        STRIPE_MAX_RETRIES=int(os.getenv("STRIPE_MAX_RETRIES", "2")),
+        RESEND_CONNECT_TIMEOUT=float(os.getenv("RESEND_CONNECT_TIMEOUT", "3")),
+        RESEND_READ_TIMEOUT=float(os.getenv("RESEND_READ_TIMEOUT", "15")),
+        RESEND_MAX_RETRIES=int(os.getenv("RESEND_MAX_RETRIES", "1")),
+        BREAKER_FAILURE_THRESHOLD=int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")),
+        BREAKER_RESET_SECONDS=float(os.getenv("BREAKER_RESET_SECONDS", "30")),
+        RETRY_BUDGET_RATIO=float(os.getenv("RETRY_BUDGET_RATIO", "0.2")),
         JWT_ACCESS_TOKEN_EXPIRES=timedelta(days=7),
         MAX_EXPORT_ROWS=int(os.getenv("MAX_EXPORT_ROWS", "5000")),
         MAX_PAYLOAD_BYTES=int(os.getenv("MAX_PAYLOAD_BYTES", str(2 * 1024 * 1024))),
+        MAX_DECOMPRESSED_BYTES=int(os.getenv("MAX_DECOMPRESSED_BYTES", str(8 * 1024 * 1024))),
+        COMPRESS_MIN_BYTES=int(os.getenv("COMPRESS_MIN_BYTES", "1024")),
+        COMPRESS_MAX_FILE_BYTES=int(os.getenv("COMPRESS_MAX_FILE_BYTES", str(256 * 1024))),  # larger downloads stream as-is
+        RESPONSE_CACHE_ENTRIES=int(os.getenv("RESPONSE_CACHE_ENTRIES", "2048")),
+        MAX_SYNC_SCANS=int(os.getenv("MAX_SYNC_SCANS", "5000")),
+        MAX_BATCH_EXPORTS=int(os.getenv("MAX_BATCH_EXPORTS", "10")),
+        RATELIMIT_ENABLED=os.getenv("RATELIMIT_ENABLED", "1") == "1",
+        RATELIMIT_STORAGE_URI=os.getenv("RATELIMIT_STORAGE_URI", "memory://"),
+        EXPORT_RENDER_WORKERS=int(os.getenv("EXPORT_RENDER_WORKERS", str(min(4, os.cpu_count() or 1)))),
+        EXPORT_RENDER_PROCESSES=int(os.getenv("EXPORT_RENDER_PROCESSES", str(os.cpu_count() or 1))),
+        EXPORT_PARALLEL_THRESHOLD=int(os.getenv("EXPORT_PARALLEL_THRESHOLD", "2500")),  # rows; <= MAX_EXPORT_ROWS
+        EXPORT_CACHE_BYTES=int(os.getenv("EXPORT_CACHE_BYTES", str(64 * 1024 * 1024))),  # 0 disables
+        EXPORT_CACHE_DIR=os.getenv("EXPORT_CACHE_DIR", ""),  # default: /dev/shm (shared by all workers)
         FRONTEND_ORIGINS=os.getenv(
             "FRONTEND_ORIGINS",
             "http://localhost:8081,http://127.0.0.1:8081,http://localhost:19006,http://127.0.0.1:19006",
         ),
         PASSWORD_RESET_TOKEN_TTL=int(os.getenv("PASSWORD_RESET_TOKEN_TTL", "3600")),
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "INFO").upper(),
+        LOG_QUEUE_SIZE=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+        LOG_ACCESS=os.getenv("LOG_ACCESS", "1") == "1",
+        PAGES_MAX_AGE=int(os.getenv("PAGES_MAX_AGE", "86400")),
+        PAGES_ACCEL_REDIRECT_PREFIX=os.getenv("PAGES_ACCEL_REDIRECT_PREFIX", ""),
+        ADMIN_USERNAMES=os.getenv("ADMIN_USERNAMES", ""),
+        MAINTENANCE_ENABLED=os.getenv("MAINTENANCE_ENABLED", "1") == "1",
+        MAINTENANCE_INTERVAL_SECONDS=int(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "3600")),
+        MAINTENANCE_START_DELAY_SECONDS=int(os.getenv("MAINTENANCE_START_DELAY_SECONDS", "60")),
+        MAINTENANCE_BATCH_SIZE=int(os.getenv("MAINTENANCE_BATCH_SIZE", "500")),
+        MAINTENANCE_BATCH_PAUSE_SECONDS=float(os.getenv("MAINTENANCE_BATCH_PAUSE_SECONDS", "0.05")),
+        MAINTENANCE_JOB_BUDGET_SECONDS=float(os.getenv("MAINTENANCE_JOB_BUDGET_SECONDS", "2")),
+        MAINTENANCE_VACUUM_PAGES=int(os.getenv("MAINTENANCE_VACUUM_PAGES", "1000")),
+        PROCESSED_EVENT_RETENTION_DAYS=int(os.getenv("PROCESSED_EVENT_RETENTION_DAYS", "30")),
+        FORMS_CONFIG_PATH=os.getenv("FORMS_CONFIG_PATH") or _default_forms_path(app),
     )
 
 
     if not app.debug and (not app.config["SECRET_KEY"] or not app.config["JWT_SECRET_KEY"]):
         raise RuntimeError("SECRET_KEY and JWT_SECRET_KEY must be set in production")
 
+    logs.init_app(app)
+
+    if not os.path.isfile(app.config["FORMS_CONFIG_PATH"]):
+        app.logger.warning(
+            "Forms config not found at %s: duplicate rules, row validation and delta keys are off",
+            app.config["FORMS_CONFIG_PATH"],
+        )
+
+    # Read-only routes get their own engine/pool (see db_routing.py)
+    read_uri = db_routing.read_bind_uri(
+        app.config["SQLALCHEMY_DATABASE_URI"], app.config["SQLALCHEMY_READ_DATABASE_URI"]
+    )
+    if app.config["DB_READ_ROUTING"] and read_uri:
+        app.config["SQLALCHEMY_BINDS"] = {
+            db_routing.READ_BIND: {"url": read_uri, "pool_size": app.config["DB_READ_POOL_SIZE"]},
+        }
+
+    if app.config["DB_POOL_SIZE"]:
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_size": app.config["DB_POOL_SIZE"], "max_overflow": 10}
+
     db.init_app(app)
+    db_routing.init_app(app, db)
     jwt.init_app(app)
     limiter.init_app(app)
 
@@ -59,8 +129,10 @@ def create_app():
         supports_credentials=False,
     )
 
-    if app.config.get("RESEND_API_KEY"):
-        resend.api_key = app.config["RESEND_API_KEY"]
+    compression.init_app(app)
+
+    outbound.init_app(app)
+    filecache.init_app(app)
 
     @app.errorhandler(Exception)
     def handle_errors(e):
@@ -74,6 +146,9 @@ def create_app():
 
     migrate.init_app(app, db)  # <- after models import
 
+    from . import maintenance
+    maintenance.init_app(app)
+
     from .routes import bp as routes_bp
     app.register_blueprint(routes_bp, url_prefix="/api")
     app.register_blueprint(pages_bp)
@@ -0,0 +1,150 @@
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd bodies are rejected and responses use gzip only
+    zstandard = None
+
+_CHUNK = 64 * 1024
+_COMPRESSIBLE = ("application/json", "text/csv")
+
+
+class BodyError(ValueError):
+    """Unreadable request body; `code` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, code: int = 400):
+        super().__init__(message)
+        self.code = code
+
+
+class _CappedStream:
+    """Read-through wrapper that stops a chunked upload at the wire-size cap."""
+
+    def __init__(self, stream, limit: int):
+        self._stream = stream
+        self._left = limit
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._stream.read(size)
+        self._left -= len(chunk)
+        if self._left < 0:
+            raise BodyError("Payload too large.", 413)
+        return chunk
+
+
+def _inflate(stream, limit: int) -> bytes:
+    # wbits=47 accepts both gzip and zlib framing
+    decomp = zlib.decompressobj(wbits=47)
+    out = bytearray()
+    try:
+        while True:
+            chunk = stream.read(_CHUNK)
+            data = chunk
+            while data:
+                # max_length bounds each step, so a bomb can't expand in one call
+                out += decomp.decompress(data, limit + 1 - len(out))
+                if len(out) > limit:
+                    raise BodyError("Decompressed payload too large.", 413)
+                data = decomp.unconsumed_tail
+            if not chunk:
+                out += decomp.flush()
+                break
+    except zlib.error:
+        raise BodyError("Invalid gzip body.")
+    if len(out) > limit:
+        raise BodyError("Decompressed payload too large.", 413)
+    return bytes(out)
+
+
+def _unzstd(stream, limit: int) -> bytes:
+    out = bytearray()
+    try:
+        with zstandard.ZstdDecompressor().stream_reader(stream) as reader:
+            while True:
+                chunk = reader.read(_CHUNK)
+                if not chunk:
+                    break
+                out += chunk
+                if len(out) > limit:
+                    raise BodyError("Decompressed payload too large.", 413)
+    except zstandard.ZstdError:
+        raise BodyError("Invalid zstd body.")
+    return bytes(out)
+
+
+def _read_all(stream) -> bytes:
+    out = bytearray()
+    while True:
+        chunk = stream.read(_CHUNK)
+        if not chunk:
+            return bytes(out)
+        out += chunk
+
+
+def read_body(max_bytes: int, max_decompressed_bytes: int) -> bytes:
+    """
+    Return the request body, decoding Content-Encoding gzip/zstd as a stream.
+    The wire size is capped at max_bytes and the decoded size at
+    max_decompressed_bytes; raises BodyError otherwise.
+    """
+    if (request.content_length or 0) > max_bytes:
+        raise BodyError("Payload too large.", 413)
+
+    encoding = (request.headers.get("Content-Encoding") or "identity").strip().lower()
+    # Chunked uploads carry no Content-Length, so every body is read capped.
+    stream = _CappedStream(request.stream, max_bytes)
+    if encoding == "identity":
+        return _read_all(stream)
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        return _inflate(stream, max_decompressed_bytes)
+    if encoding == "zstd" and zstandard is not None:
+        return _unzstd(stream, max_decompressed_bytes)
+    raise BodyError(f"Unsupported Content-Encoding '{encoding}'.", 415)
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def init_app(app):
+    """Compress JSON/CSV responses per Accept-Encoding (zstd if available, else gzip)."""
+    encodings = ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+
+    @app.after_request
+    def compress_response(response):
+        if (
+            response.status_code != 200
+            or response.mimetype not in _COMPRESSIBLE
+            or "Content-Encoding" in response.headers
+            or "Content-Range" in response.headers
+        ):
+            return response
+
+        if response.direct_passthrough:
+            # File downloads stream from disk (or the export cache); only
+            # small ones are worth reading into memory to compress.
+            if response.content_length is None or response.content_length > app.config["COMPRESS_MAX_FILE_BYTES"]:
+                return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = request.accept_encodings.best_match(encodings)
+        if not encoding:
+            return response
+
+        response.direct_passthrough = False
+        data = response.get_data()
+        if len(data) < app.config["COMPRESS_MIN_BYTES"]:
+            return response
+
+        response.set_data(_compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # the encoded body is a different representation of the same resource
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,78 @@
+"""
+Read/write session routing.
+
+Routes decorated with @read_only run their ORM SELECTs on the "read" bind:
+a second, read-only engine on the same SQLite file (WAL lets its readers run
+alongside the writer), or a replica given by SQLALCHEMY_READ_DATABASE_URI.
+Flushes and DML always go to the primary, as does anything outside a
+read-only route (token charges, export inserts).
+"""
+from functools import wraps
+
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+
+READ_BIND = "read"
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and has_request_context()
+            and g.get("db_read_only")
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+        ):
+            engines = self._db.engines
+            if READ_BIND in engines:
+                return engines[READ_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only(view):
+    """Mark a route as read-only so its queries use the read bind."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            g.db_read_only = False
+    return wrapper
+
+
+def read_bind_uri(primary_uri: str, replica_uri: str | None):
+    """URI for the read bind: an explicit replica, else the SQLite file opened read-only."""
+    if replica_uri:
+        return replica_uri
+    prefix = "sqlite:///"
+    if primary_uri.startswith(prefix) and primary_uri != prefix + ":memory:":
+        return f"sqlite:///file:{primary_uri[len(prefix):]}?mode=ro&uri=true"
+    return None
+
+
+def init_app(app, db):
+    """Turn on WAL for the app's SQLite engines so read-bind readers don't block on writes."""
+    if not app.config["SQLITE_WAL"]:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", _sqlite_pragmas)
+
+
+def _sqlite_pragmas(dbapi_conn, _record):
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.execute("PRAGMA busy_timeout = 5000")
+        cursor.execute("PRAGMA journal_mode")
+        if cursor.fetchone()[0] != "wal":
+            try:
+                cursor.execute("PRAGMA journal_mode = WAL")
+            except Exception:
+                pass  # read-only connection; the primary switches the file over
+    finally:
+        cursor.close()
@@ -0,0 +1,54 @@
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request
+
+# (resource, user_id, version) -> (body bytes, status); LRU, per process.
+_responses = OrderedDict()
+_responses_lock = threading.Lock()
+
+
+def _cache_get(key):
+    with _responses_lock:
+        hit = _responses.get(key)
+        if hit is not None:
+            _responses.move_to_end(key)
+        return hit
+
+
+def _cache_put(key, value, max_entries: int):
+    with _responses_lock:
+        _responses[key] = value
+        _responses.move_to_end(key)
+        while len(_responses) > max_entries:
+            _responses.popitem(last=False)
+
+
+def versioned_json(resource: str, user_id, version, build):
+    """
+    Answer a polled GET from a per-user version validator.
+
+    If the client's If-None-Match carries the current weak ETag, reply 304
+    without running `build`. Otherwise serve the JSON body cached for this
+    version, or call build() -> (payload, status) and cache it. Because the key
+    includes the version, a bumped counter can never be answered from a stale
+    entry, whichever worker served the write.
+    """
+    etag = f"{resource}-{user_id}-{version}"
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        key = (resource, str(user_id), str(version))
+        cached = _cache_get(key)
+        if cached is None:
+            payload, status = build()
+            cached = (current_app.json.dumps(payload).encode("utf-8"), status)
+            if status == 200:
+                _cache_put(key, cached, current_app.config["RESPONSE_CACHE_ENTRIES"])
+        body, status = cached
+        response = current_app.response_class(body, status=status, mimetype="application/json")
+
+    response.set_etag(etag, weak=True)
+    # Clients poll: always revalidate, never reuse without asking.
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
@@ -0,0 +1,632 @@
+import csv
+import json
+import logging
+import multiprocessing
+import operator
+import os
+import pickle
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from sqlalchemy import insert, text
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX dev machines
+    fcntl = None
+
+from .forms import key_fields
+from .models import db, ExportRow
+from .wire import Columns
+
+logger = logging.getLogger(__name__)
+
+# Max keys per IN (...) lookup; stays under SQLite's bound-parameter limit.
+_LOOKUP_CHUNK = 500
+
+
+def csv_safe(value):
+    """Mitigate CSV injection: prefix dangerous leading chars with a single quote."""
+    if value is None:
+        return ""
+    s = str(value)
+    if s[:1] in ("=", "+", "-", "@"):
+        return "'" + s
+    return s
+
+
+def csv_unsafe(value: str) -> str:
+    """The value csv_safe() was given, for a value read back from one of our CSVs."""
+    if value[:1] == "'" and value[1:2] in ("=", "+", "-", "@"):
+        return value[1:]
+    return value
+
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def render_pool(max_workers: int) -> ThreadPoolExecutor:
+    """Process-wide pool for rendering several exports' CSVs concurrently."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                              thread_name_prefix="export-render")
+        return _render_pool
+
+
+def parse_rows(rows: list, malformed=None):
+    """
+    Flatten posted rows ({id, form_id, scanned_at, data: JSON string}) into
+    one dict per scan. Returns (parsed_rows, full_fieldnames); rows that are
+    not objects or carry unparseable data are skipped, and when a malformed
+    list is given an entry for each is appended to it (see app/validation.py).
+    """
+    full_fieldnames = set()
+    parsed_rows = []
+
+    for i, row in enumerate(rows):
+        if not isinstance(row, dict):
+            if malformed is not None:
+                malformed.append({"row": i, "errors": {"row": "not_an_object"}})
+            continue
+        data_obj = row.get("data")
+        if isinstance(data_obj, str):
+            try:
+                data_obj = json.loads(data_obj)
+            except ValueError:
+                if malformed is not None:
+                    malformed.append({"row": i, "id": row.get("id"), "errors": {"data": "invalid_json"}})
+                continue
+        merged = {
+            **(data_obj if isinstance(data_obj, dict) else {}),
+            "id": row.get("id"),
+            "form_id": row.get("form_id"),
+            "scanned_at": row.get("scanned_at"),
+        }
+        parsed_rows.append(merged)
+        full_fieldnames.update(merged.keys())
+
+    return parsed_rows, full_fieldnames
+
+
+def write_csv(path: str, fieldnames: list, rows: list):
+    """rows: parsed row dicts or Columns (rendered column by column)."""
+    with open(path, mode="w", newline="", encoding="utf-8") as f:
+        if isinstance(rows, Columns):
+            writer = csv.writer(f)
+            writer.writerow(fieldnames)
+            writer.writerows(zip(*[list(map(csv_safe, col)) for col in _value_columns(rows, fieldnames)]))
+            return
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: csv_safe(row.get(k, "")) for k in fieldnames})
+
+
+def field_values(rows, field) -> list:
+    """One field's value for each row (None where missing); rows may be Columns."""
+    if isinstance(rows, Columns):
+        col = rows.column(field)
+        return col if col is not None else [None] * len(rows)
+    return [row.get(field) for row in rows]
+
+
+def _value_columns(rows: Columns, fieldnames: list) -> list:
+    """Columns for fieldnames, "" for fields the group does not have (as row.get(k, ""))."""
+    blank = [""] * len(rows)
+    return [col if col is not None else blank for col in map(rows.column, fieldnames)]
+
+
+def write_export_files(folder: str, export_id: str, minimal_headers: list,
+                       full_fieldnames: set, rows: list, processes: int = 1,
+                       parallel_threshold: int = 0):
+    """
+    Write <export_id>_minimal.csv and <export_id>_full.csv; returns their names.
+    With processes > 1 and at least parallel_threshold rows, both files are
+    rendered in chunks on the process pool (see write_csv_parallel); if the
+    pool breaks (a worker was killed, e.g. out of memory) they are written
+    serially instead and the next call starts a fresh pool.
+    """
+    minimal_csv_name = f"{export_id}_minimal.csv"
+    full_csv_name = f"{export_id}_full.csv"
+    outputs = [
+        (os.path.join(folder, minimal_csv_name), minimal_headers or sorted(full_fieldnames)),
+        (os.path.join(folder, full_csv_name), sorted(full_fieldnames)),
+    ]
+    if processes > 1 and parallel_threshold and len(rows) >= parallel_threshold:
+        try:
+            write_csv_parallel(outputs, rows, processes)
+            return minimal_csv_name, full_csv_name
+        except BrokenProcessPool:
+            logger.warning("Render process pool broke; writing export %s serially", export_id)
+    for path, fieldnames in outputs:
+        write_csv(path, fieldnames, rows)
+    return minimal_csv_name, full_csv_name
+
+
+# --------------------------------------------------------------------------- #
+# Parallel rendering                                                          #
+# --------------------------------------------------------------------------- #
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Process-wide pool for CPU-bound CSV rendering. Workers come from a fork
+    server, so they never inherit the web worker's threads, locks or DB sockets.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                # Import once in the fork server rather than in every worker.
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context("spawn")
+            _process_pool = ProcessPoolExecutor(max_workers=max(1, max_workers), mp_context=context)
+        return _process_pool
+
+
+def _discard_process_pool(pool: ProcessPoolExecutor):
+    """Forget a broken pool so process_pool() builds a new one."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_fragments(outputs: list, table_path: str, start: int, stop: int):
+    """
+    Pool task: read one chunk of the row table (bytes start..stop of
+    table_path, see write_csv_parallel) and write it, without a header, to
+    each (fragment path, column indexes).
+    """
+    with open(table_path, "rb") as f:
+        f.seek(start)
+        rows = pickle.loads(f.read(stop - start))
+    for path, columns in outputs:
+        with open(path, mode="w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerows([csv_safe(row[i]) for i in columns] for row in rows)
+
+
+def _append_file(dst_fd: int, offset: int, src_path: str) -> int:
+    """
+    Copy src_path into dst_fd at `offset` without passing the bytes through
+    Python: copy_file_range, else sendfile, else a plain read/write loop.
+    Returns the offset just past the copied data.
+    """
+    with open(src_path, "rb") as src:
+        size = os.fstat(src.fileno()).st_size
+        done = 0
+        try:
+            while done < size:
+                copied = os.copy_file_range(src.fileno(), dst_fd, size - done, done, offset + done)
+                if not copied:
+                    break
+                done += copied
+        except (AttributeError, OSError):
+            try:
+                os.lseek(dst_fd, offset + done, os.SEEK_SET)
+                while done < size:
+                    copied = os.sendfile(dst_fd, src.fileno(), done, size - done)
+                    if not copied:
+                        break
+                    done += copied
+            except (AttributeError, OSError):
+                os.lseek(dst_fd, offset + done, os.SEEK_SET)
+                src.seek(done)
+                with open(dst_fd, "wb", closefd=False) as dst:
+                    shutil.copyfileobj(src, dst)
+                done = size
+    return offset + size
+
+
+def _value_tuples(rows, fields: list) -> list:
+    """Each row's values in `fields` order, "" for missing fields (as row.get(k, ""))."""
+    if isinstance(rows, Columns):
+        return list(zip(*_value_columns(rows, fields)))
+    # itemgetter of one field returns the bare value, not a 1-tuple
+    values = operator.itemgetter(*fields) if len(fields) > 1 else (lambda row: tuple(row[k] for k in fields))
+    blanks = [""] * len(fields)
+
+    def as_tuple(row):
+        try:
+            return values(row)
+        except KeyError:
+            return tuple(map(row.get, fields, blanks))
+
+    return [as_tuple(row) for row in rows]
+
+
+def _write_row_table(path: str, chunks: list) -> list:
+    """
+    Write each chunk of value tuples to path, pickled, one after the other;
+    returns each chunk's (start, stop) byte range. Workers read only their
+    range instead of receiving the rows through the pool's pipe.
+    """
+    ranges = []
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            start = f.tell()
+            pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+            ranges.append((start, f.tell()))
+    return ranges
+
+
+def write_csv_parallel(outputs: list, rows: list, processes: int, chunks_per_process: int = 2):
+    """
+    Render several CSVs of the same rows ([(path, fieldnames), ...]) on the
+    process pool. The rows' values are split into contiguous chunks and
+    written once to a shared row table file; each task reads its chunk's byte range and renders
+    it once per output into fragment files, and the fragments are joined in
+    order after each header. The result is byte-for-byte what write_csv()
+    produces.
+    """
+    fields = list(dict.fromkeys(k for _, fieldnames in outputs for k in fieldnames))
+    position = {k: i for i, k in enumerate(fields)}
+    columns = [[position[k] for k in fieldnames] for _, fieldnames in outputs]
+
+    table = _value_tuples(rows, fields)
+    n_chunks = max(1, min(len(table), processes * chunks_per_process))
+    size = -(-len(table) // n_chunks)
+    chunks = [table[i:i + size] for i in range(0, len(table), size)]
+    fragments = [
+        [(f"{path}.part{i}", cols) for (path, _), cols in zip(outputs, columns)]
+        for i in range(len(chunks))
+    ]
+    table_path = f"{outputs[0][0]}.rows"
+
+    pool = process_pool(processes)
+    try:
+        ranges = _write_row_table(table_path, chunks)
+        try:
+            futures = [pool.submit(_render_fragments, parts, table_path, start, stop)
+                       for parts, (start, stop) in zip(fragments, ranges)]
+            for future in futures:
+                future.result()
+        except BrokenProcessPool:
+            _discard_process_pool(pool)
+            raise
+
+        for index, (path, fieldnames) in enumerate(outputs):
+            with open(path, mode="w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(fieldnames)
+            fd = os.open(path, os.O_WRONLY)  # not O_APPEND: copy_file_range rejects it
+            try:
+                offset = os.fstat(fd).st_size
+                for parts in fragments:
+                    offset = _append_file(fd, offset, parts[index][0])
+            finally:
+                os.close(fd)
+    finally:
+        for part_path in [table_path] + [part for parts in fragments for part, _ in parts]:
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+
+
+def row_key(row: dict, fields: list) -> str:
+    """Index key for a parsed row: its key-field values, or the scan id if the form is unknown."""
+    if not fields:
+        return str(row.get("id") or "")
+    return "\x1f".join(str(row.get(f) or "") for f in fields)[:255]
+
+
+def row_keys(rows, fields: list) -> list:
+    """row_key() of every row, read column by column; rows may be Columns."""
+    if not fields:
+        return [str(v or "") for v in field_values(rows, "id")]
+    return ["\x1f".join([str(v or "") for v in values])[:255]
+            for values in zip(*[field_values(rows, f) for f in fields])]
+
+
+def _lookup_value(value):
+    return str(value)[:255] if value not in (None, "") else None
+
+
+def index_entries(export, rows: list, fields: list, start: int = 0, location_field=None) -> list:
+    """Build export_rows records for rows written at positions start, start+1, ..."""
+    n = len(rows)
+    barcodes = field_values(rows, fields[0]) if fields else [None] * n
+    locations = field_values(rows, location_field) if location_field else [None] * n
+    return [
+        {
+            "export_pk": export.id,
+            "row_no": start + i,
+            "row_key": key,
+            "user_id": export.user_id,
+            "barcode": _lookup_value(barcode),
+            "location": _lookup_value(location),
+        }
+        for i, (key, barcode, location) in enumerate(zip(row_keys(rows, fields), barcodes, locations))
+    ]
+
+
+def apply_duplicate_rules(rows: list, form, max_keys: int = 20):
+    """
+    Enforce a form's handleDuplicateKey / handleIdenticalFields on parsed rows
+    (dicts or Columns) in one pass, using a dict keyed on the form's key fields.
+
+    - "error":  the first row for a key is kept, later ones are dropped
+    - "update": one row per key, at the first row's position, holding the row
+                with the latest scanned_at (ties go to the later row)
+    - handleIdenticalFields "error": rows whose first two fields are equal are dropped
+
+    Returns (rows, summary); summary is None when the form declares no rules.
+    """
+    if not form:
+        return rows, None
+
+    mode = form.get("handleDuplicateKey")
+    fields = key_fields(form)
+    form_fields = [f.get("id") for f in form.get("fields") or []]
+    check_identical = form.get("handleIdenticalFields") == "error" and len(form_fields) >= 2
+    if mode not in ("error", "update") and not check_identical:
+        return rows, None
+
+    keyed = mode in ("error", "update")
+    keys = row_keys(rows, fields) if keyed else None
+    stamps = field_values(rows, "scanned_at") if mode == "update" else None
+    if check_identical:
+        firsts, seconds = (field_values(rows, f) for f in form_fields[:2])
+    kept = []  # positions in rows
+    slot_by_key = {}
+    duplicate_keys = []
+    duplicates = identical = 0
+
+    for i in range(len(rows)):
+        if check_identical and str(firsts[i] or "") == str(seconds[i] or ""):
+            identical += 1
+            continue
+
+        if not keyed:
+            kept.append(i)
+            continue
+
+        key = keys[i]
+        slot = slot_by_key.get(key)
+        if slot is None:
+            slot_by_key[key] = len(kept)
+            kept.append(i)
+            continue
+
+        duplicates += 1
+        if len(duplicate_keys) < max_keys:
+            duplicate_keys.append(key.replace("\x1f", " / "))
+        if mode == "update" and str(stamps[i] or "") >= str(stamps[kept[slot]] or ""):
+            kept[slot] = i
+
+    summary = {
+        "mode": mode,
+        "duplicates": duplicates,
+        "dropped": duplicates if mode == "error" else 0,
+        "merged": duplicates if mode == "update" else 0,
+        "identical": identical,
+        "keys": duplicate_keys,
+    }
+    if isinstance(rows, Columns):
+        return rows.take(kept), summary
+    return [rows[i] for i in kept], summary
+
+
+@contextmanager
+def export_lock(folder: str, export_id: str):
+    """Serialize writers of one export's files across workers."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(folder, f".{export_id}.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_header(path: str) -> list:
+    with open(path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+
+def _existing_keys(export_pk: int, keys: list) -> dict:
+    """Map row_key -> [row_no, ...] for the keys already present in an export."""
+    found = {}
+    for i in range(0, len(keys), _LOOKUP_CHUNK):
+        chunk = keys[i:i + _LOOKUP_CHUNK]
+        hits = (
+            db.session.query(ExportRow.row_key, ExportRow.row_no)
+            .filter(ExportRow.export_pk == export_pk, ExportRow.row_key.in_(chunk))
+            .all()
+        )
+        for key, row_no in hits:
+            found.setdefault(key, []).append(row_no)
+    return found
+
+
+def _rebuild_index(folder: str, export, fields: list, location_field=None) -> list:
+    """Index an export written before export_rows existed, from its full CSV."""
+    with open(os.path.join(folder, export.full_csv), newline="", encoding="utf-8") as f:
+        # Keys must match row_key() of parsed rows, so undo csv_safe()
+        rows = [{k: csv_unsafe(v or "") for k, v in row.items()} for row in csv.DictReader(f)]
+    entries = index_entries(export, rows, fields, location_field=location_field)
+    if entries:
+        db.session.execute(insert(ExportRow), entries)
+    export.row_count = len(rows)
+    return entries
+
+
+def _rewrite_csv(path: str, dst_path: str, fieldnames: list, updates: dict, new_rows: list):
+    """
+    Write a copy of one CSV to dst_path with a (possibly wider) header,
+    replacing the rows in `updates` (row_no -> parsed row) and appending
+    `new_rows`. Untouched rows are copied verbatim; they were already
+    sanitized when first written.
+    """
+    with open(path, newline="", encoding="utf-8") as src, \
+            open(dst_path, mode="w", newline="", encoding="utf-8") as dst:
+        reader = csv.reader(src)
+        old_header = next(reader, [])
+        writer = csv.writer(dst)
+        writer.writerow(fieldnames)
+        same_header = old_header == fieldnames
+        for row_no, values in enumerate(reader):
+            row = updates.get(row_no)
+            if row is not None:
+                writer.writerow([csv_safe(row.get(k, "")) for k in fieldnames])
+            elif same_header:
+                writer.writerow(values)
+            else:
+                old = dict(zip(old_header, values))
+                writer.writerow([old.get(k, "") for k in fieldnames])
+        for row in new_rows:
+            writer.writerow([csv_safe(row.get(k, "")) for k in fieldnames])
+
+
+def _append_csv(path: str, dst_path: str, fieldnames: list, rows: list):
+    """Copy one CSV to dst_path and append rows to the copy."""
+    shutil.copyfile(path, dst_path)  # sendfile / copy_file_range, no Python-level copy
+    with open(dst_path, mode="a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for row in rows:
+            writer.writerow([csv_safe(row.get(k, "")) for k in fieldnames])
+
+
+def apply_delta(folder: str, export, parsed_rows: list, full_fieldnames: set,
+                fields: list, on_duplicate: str = "update", location_field=None) -> dict:
+    """
+    Merge delta rows into an existing export's CSVs.
+
+    Rows whose key is not yet in the export are appended; rows whose key is
+    already present replace the stored row when on_duplicate == "update" and
+    reject the whole delta (ValueError) when it is "error". Plain appends copy
+    the file and write at the end; the rows are re-rendered only when a row is
+    replaced or the delta brings new columns.
+
+    The export's files are not touched: the merged CSVs are written next to
+    them and listed in "staged" as (staged path, final path). The caller
+    must hold export_lock() and load `export` inside it, then
+    publish_staged() and commit the index records ("index") and row_count
+    in one transaction, restoring the published files if the commit fails.
+    """
+    minimal_path = os.path.join(folder, export.minimal_csv)
+    full_path = os.path.join(folder, export.full_csv)
+    if not os.path.isfile(minimal_path) or not os.path.isfile(full_path):
+        raise RuntimeError("Base export files not found.")
+
+    if not export.row_count:
+        _rebuild_index(folder, export, fields, location_field)
+
+    # Last occurrence of a key within the delta wins, as on the device.
+    latest = {}
+    for row in parsed_rows:
+        latest[row_key(row, fields)] = row
+
+    existing = _existing_keys(export.id, list(latest))
+    if existing and on_duplicate == "error":
+        sample = ", ".join(k.replace("\x1f", " / ") for k in list(existing)[:5])
+        raise ValueError(f"{len(existing)} row(s) already in base export: {sample}")
+
+    updates = {}
+    new_rows = []
+    for key, row in latest.items():
+        if key in existing:
+            for row_no in existing[key]:
+                updates[row_no] = row
+        else:
+            new_rows.append(row)
+
+    minimal_header = _read_header(minimal_path)
+    full_header = _read_header(full_path)
+    new_full_header = sorted(set(full_header) | full_fieldnames)
+
+    staged = [(minimal_path + ".staged", minimal_path), (full_path + ".staged", full_path)]
+    try:
+        if updates:
+            _rewrite_csv(minimal_path, staged[0][0], minimal_header, updates, new_rows)
+        else:
+            _append_csv(minimal_path, staged[0][0], minimal_header, new_rows)
+
+        if updates or new_full_header != full_header:
+            _rewrite_csv(full_path, staged[1][0], new_full_header, updates, new_rows)
+        else:
+            _append_csv(full_path, staged[1][0], full_header, new_rows)
+    except Exception:
+        discard_staged(staged)
+        raise
+
+    if updates and location_field:
+        # Replaced rows keep their key (barcode) but may have moved.
+        db.session.execute(
+            text("UPDATE export_rows SET location = :location WHERE export_pk = :export_pk AND row_no = :row_no"),
+            [
+                {"location": _lookup_value(row.get(location_field)), "export_pk": export.id, "row_no": row_no}
+                for row_no, row in updates.items()
+            ],
+        )
+
+    start = export.row_count
+    export.row_count = start + len(new_rows)
+    return {
+        "appended": len(new_rows),
+        "updated": len(updates),
+        "row_count": export.row_count,
+        "index": index_entries(export, new_rows, fields, start=start, location_field=location_field),
+        "staged": staged,
+    }
+
+
+def publish_staged(staged: list) -> list:
+    """
+    Move apply_delta()'s staged CSVs over the export's files. The replaced
+    files are kept (hard links) and returned as backups for
+    restore_published(); drop_backups() once the delta is committed.
+    """
+    backups = []
+    try:
+        for staged_path, path in staged:
+            backup = path + ".bak"
+            if os.path.exists(backup):
+                os.remove(backup)
+            try:
+                os.link(path, backup)
+            except OSError:  # no hard links on this filesystem
+                shutil.copy2(path, backup)
+            backups.append((backup, path))
+            os.replace(staged_path, path)
+    except Exception:
+        restore_published(backups)
+        discard_staged(staged)
+        raise
+    return backups
+
+
+def restore_published(backups: list):
+    """Put the files replaced by publish_staged() back."""
+    for backup, path in backups:
+        os.replace(backup, path)
+
+
+def drop_backups(backups: list):
+    for backup, _ in backups:
+        try:
+            os.remove(backup)
+        except FileNotFoundError:
+            pass
+
+
+def discard_staged(staged: list):
+    for staged_path, _ in staged:
+        try:
+            os.remove(staged_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,245 @@
+"""
+Shared LRU cache of recently written export files and their base64.
+
+Right after an export is written its CSVs are base64-encoded for the email,
+then usually downloaded straight away or re-sent with /exports/resend. This
+cache keeps the raw bytes and the base64 text of those files in a directory
+on tmpfs (/dev/shm when present), so every worker process on the host
+shares one copy in memory and a resend no longer re-reads and re-encodes
+the files from disk.
+
+- Entries are keyed by the source file's path, size and mtime, so a file
+  rewritten in place (delta exports) never serves stale bytes, and a file
+  that no longer exists is never served at all.
+- The total size of the directory is kept under EXPORT_CACHE_BYTES; least
+  recently used entries are evicted first (a hit refreshes the entry's
+  mtime). Files larger than a quarter of the budget are not cached.
+- Hit / miss / store / eviction counters live in a small mmap'd file in the
+  same directory, so they add up across workers (GET /api/admin/export-cache).
+
+Writes go to a temp file and are renamed into place, so readers never see a
+partial entry; an entry evicted while being read stays readable until the
+reader closes it.
+"""
+import base64
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX dev machines
+    fcntl = None
+
+from flask import current_app
+
+_COUNTERS = ("hits", "misses", "stores", "evictions")
+_STATS = struct.Struct("<4Q")
+_RAW, _B64 = ".csv", ".b64"
+
+
+class ExportFileCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 4
+        os.makedirs(directory, exist_ok=True)
+
+        stats_path = os.path.join(directory, ".stats")
+        fd = os.open(stats_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < _STATS.size:
+                os.ftruncate(fd, _STATS.size)
+            self._stats = mmap.mmap(fd, _STATS.size)  # MAP_SHARED: one set of counters per host
+        finally:
+            os.close(fd)
+
+        self._thread_lock = threading.Lock()
+        self._lock_file = None
+        self._lock_pid = None
+
+    # ---- cross-process lock ------------------------------------------------ #
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            # flock is per open file, so each (forked) process opens its own
+            if self._lock_pid != os.getpid():
+                self._lock_file = open(os.path.join(self.directory, ".lock"), "a")
+                self._lock_pid = os.getpid()
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _count(self, name: str, n: int = 1):
+        i = _COUNTERS.index(name)
+        with self._locked():
+            values = list(_STATS.unpack_from(self._stats))
+            values[i] += n
+            _STATS.pack_into(self._stats, 0, *values)
+
+    # ---- entries ----------------------------------------------------------- #
+    def _entry(self, path: str):
+        """Cache entry stem for the file at path as it is now, or None if it's gone."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = f"{os.path.abspath(path)}\0{st.st_size}\0{st.st_mtime_ns}"
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest()), st.st_size
+
+    def _hit(self, cached: str) -> bool:
+        try:
+            os.utime(cached)  # refresh for LRU
+        except OSError:  # evicted in the meantime
+            self._count("misses")
+            return False
+        self._count("hits")
+        return True
+
+    def raw_path(self, path: str):
+        """Path of the cached copy of path (for send_file), or None on a miss."""
+        entry = self._entry(path)
+        if entry is None:
+            return None
+        cached = entry[0] + _RAW
+        return cached if self._hit(cached) else None
+
+    def read_base64(self, path: str):
+        """Cached base64 text of the file at path, or None on a miss."""
+        entry = self._entry(path)
+        if entry is None:
+            return None
+        cached = entry[0] + _B64
+        try:
+            with open(cached, "rb") as f:
+                content = f.read()
+        except OSError:
+            self._count("misses")
+            return None
+        self._hit(cached)
+        return content.decode("ascii")
+
+    def store(self, path: str, data: bytes, encoded: bytes):
+        """Cache data (the contents of path) and its base64 encoding."""
+        entry = self._entry(path)
+        if entry is None:
+            return
+        stem, size = entry
+        needed = len(data) + len(encoded)
+        if size != len(data) or needed > self.max_entry_bytes:
+            return
+        with self._locked():
+            evicted = self._evict(self.max_bytes - needed)
+            for suffix, blob in ((_RAW, data), (_B64, encoded)):
+                fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(blob)
+                os.replace(tmp, stem + suffix)
+            values = list(_STATS.unpack_from(self._stats))
+            values[_COUNTERS.index("stores")] += 1
+            values[_COUNTERS.index("evictions")] += evicted
+            _STATS.pack_into(self._stats, 0, *values)
+
+    def _scan(self) -> dict:
+        """{stem: (last_used, bytes)} for every entry; call with the lock held."""
+        entries = {}
+        with os.scandir(self.directory) as it:
+            for de in it:
+                if de.name.startswith("."):
+                    continue
+                try:
+                    st = de.stat()
+                except OSError:
+                    continue
+                stem = os.path.join(self.directory, os.path.splitext(de.name)[0])
+                used, size = entries.get(stem, (0, 0))
+                entries[stem] = (max(used, st.st_mtime_ns), size + st.st_size)
+        return entries
+
+    def _evict(self, budget: int) -> int:
+        """Drop least recently used entries until the total is <= budget; call with the lock held."""
+        entries = self._scan()
+        total = sum(size for _, size in entries.values())
+        evicted = 0
+        for stem, (_, size) in sorted(entries.items(), key=lambda kv: kv[1][0]):
+            if total <= budget:
+                break
+            for suffix in (_RAW, _B64):
+                try:
+                    os.remove(stem + suffix)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            evicted += 1
+        return evicted
+
+    def stats(self) -> dict:
+        with self._locked():
+            values = _STATS.unpack_from(self._stats)
+            entries = self._scan()
+        stats = dict(zip(_COUNTERS, values))
+        lookups = stats["hits"] + stats["misses"]
+        stats.update(
+            hit_ratio=round(stats["hits"] / lookups, 3) if lookups else None,
+            entries=len(entries),
+            bytes=sum(size for _, size in entries.values()),
+            max_bytes=self.max_bytes,
+            directory=self.directory,
+        )
+        return stats
+
+
+def _default_directory(app) -> str:
+    if os.path.isdir("/dev/shm"):
+        # One directory per instance folder, so two deployments on a host don't mix
+        tag = hashlib.sha1(os.path.abspath(app.instance_path).encode("utf-8")).hexdigest()[:12]
+        return os.path.join("/dev/shm", f"scan-export-cache-{tag}")
+    return os.path.join(app.instance_path, "exportCache")
+
+
+def init_app(app):
+    max_bytes = app.config.get("EXPORT_CACHE_BYTES", 0)
+    if max_bytes <= 0:
+        app.extensions["export_cache"] = None
+        return
+    directory = app.config.get("EXPORT_CACHE_DIR") or _default_directory(app)
+    app.extensions["export_cache"] = ExportFileCache(directory, max_bytes)
+
+
+def _cache():
+    return current_app.extensions.get("export_cache")
+
+
+def cached_path(path: str):
+    """Cached copy of the export file at path, or None (cache off or miss)."""
+    cache = _cache()
+    return cache.raw_path(path) if cache else None
+
+
+def encode_file(path: str) -> str:
+    """Base64 of the file at path, from the cache when possible (fills it on a miss)."""
+    cache = _cache()
+    if cache:
+        content = cache.read_base64(path)
+        if content is not None:
+            return content
+    with open(path, "rb") as f:
+        data = f.read()
+    encoded = base64.b64encode(data)
+    if cache:
+        cache.store(path, data, encoded)
+    return encoded.decode("utf-8")
+
+
+def stats():
+    cache = _cache()
+    return cache.stats() if cache else {"message": "Export cache disabled (EXPORT_CACHE_BYTES=0)."}
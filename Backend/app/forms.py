@@ -0,0 +1,69 @@
+import json
+import os
+import threading
+
+from flask import current_app
+
+# Parsed forms.json, reloaded only when the file changes on disk.
+_forms_cache = {"path": None, "mtime": None, "forms": {}}
+_forms_lock = threading.Lock()
+
+
+def load_forms() -> dict:
+    """Return {form_id: form definition} from FORMS_CONFIG_PATH (empty if missing)."""
+    path = current_app.config.get("FORMS_CONFIG_PATH")
+    try:
+        mtime = os.path.getmtime(path)
+    except (OSError, TypeError):
+        return {}
+
+    with _forms_lock:
+        if _forms_cache["path"] != path or _forms_cache["mtime"] != mtime:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                current_app.logger.exception("Failed to load forms config")
+                return {}
+            forms = {
+                form["id"]: form
+                for form in data.get("forms", [])
+                if isinstance(form, dict) and form.get("id")
+            }
+            _forms_cache.update(path=path, mtime=mtime, forms=forms)
+        return _forms_cache["forms"]
+
+
+def get_form(form_id):
+    if not form_id:
+        return None
+    return load_forms().get(form_id)
+
+
+def key_fields(form) -> list:
+    """
+    Fields that identify a scan within a form. The app keys scans on the first
+    field (see forms/[formId].js); a form may override this with "keyFields".
+    """
+    if not form:
+        return []
+    if form.get("keyFields"):
+        return list(form["keyFields"])
+    fields = form.get("fields") or []
+    return [fields[0]["id"]] if fields and fields[0].get("id") else []
+
+
+def location_field(form):
+    """
+    Field reported next to a barcode by /api/scans/lookup: the form's
+    "locationField", else its first non-key field (None for single-field forms).
+    """
+    if not form:
+        return None
+    if form.get("locationField"):
+        return form["locationField"]
+    keys = set(key_fields(form))
+    for field in form.get("fields") or []:
+        if field.get("id") and field["id"] not in keys:
+            return field["id"]
+    return None
@@ -0,0 +1,146 @@
+"""
+Non-blocking JSON logging.
+
+Request threads only format the message and push the record onto a bounded
+in-memory queue; a single listener thread writes JSON lines to stderr. When
+the queue is full the oldest record is dropped (and counted) instead of
+making the request wait, so a burst of errors during an outage — Resend
+down, Stripe timing out — never adds log I/O to response latency.
+
+Every record carries the request id (X-Request-ID, echoed back or generated),
+user id, route and the time spent in the request so far; one access line per
+request records the final status and duration.
+"""
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+
+_REQUEST_ID_MAX = 128
+
+
+class DropOldestQueue(queue.Queue):
+    """Bounded queue whose put_nowait evicts the oldest item instead of raising Full."""
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def put_nowait(self, item):
+        while True:
+            try:
+                return super().put_nowait(item)
+            except queue.Full:
+                try:
+                    self.get_nowait()
+                except queue.Empty:
+                    continue
+                with self._dropped_lock:
+                    self._dropped += 1
+
+    def take_dropped(self) -> int:
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+        return dropped
+
+
+class _ContextQueueHandler(QueueHandler):
+    """Capture request context on the calling thread; the listener has none."""
+
+    def prepare(self, record):
+        record.request_id = record.user_id = record.route = record.method = None
+        record.duration_ms = None
+        if has_request_context():
+            record.request_id = g.get("request_id")
+            record.route = request.url_rule.rule if request.url_rule else request.path
+            record.method = request.method
+            start = g.get("request_start")
+            if start is not None:
+                record.duration_ms = round((time.perf_counter() - start) * 1000, 1)
+            try:
+                record.user_id = get_jwt_identity()
+            except RuntimeError:  # route without @jwt_required
+                pass
+
+        # Render message and traceback here so no frames or args cross threads.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    _FIELDS = ("request_id", "user_id", "route", "method", "status", "duration_ms")
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.msg,
+        }
+        for field in self._FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _DropReportingListener(QueueListener):
+    def handle(self, record):
+        dropped = self.queue.take_dropped()
+        if dropped:
+            super().handle(logging.makeLogRecord({
+                "name": __name__,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"Log queue full; dropped {dropped} oldest record(s)",
+            }))
+        super().handle(record)
+
+
+def init_app(app):
+    """Replace Flask's synchronous stderr handler with the queued JSON pipeline."""
+    log_queue = DropOldestQueue(app.config["LOG_QUEUE_SIZE"])
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter())
+    listener = _DropReportingListener(log_queue, stream)
+    listener.start()
+    atexit.register(listener.stop)  # flush what's queued on shutdown
+
+    app.logger.handlers.clear()
+    app.logger.addHandler(_ContextQueueHandler(log_queue))
+    app.logger.setLevel(app.config["LOG_LEVEL"])
+    app.logger.propagate = False
+    app.extensions["log_listener"] = listener
+
+    access_log = app.config["LOG_ACCESS"]
+
+    @app.before_request
+    def _start_request_log():
+        g.request_start = time.perf_counter()
+        g.request_id = (request.headers.get("X-Request-ID") or "")[:_REQUEST_ID_MAX] or uuid.uuid4().hex
+
+    @app.after_request
+    def _finish_request_log(response):
+        request_id = g.get("request_id")
+        if request_id:
+            response.headers["X-Request-ID"] = request_id
+        if access_log:
+            app.logger.info("request", extra={"status": response.status_code})
+        return response
@@ -0,0 +1,181 @@
+"""
+Background housekeeping: purge rows that only ever accumulate and keep
+SQLite tidy.
+
+Every worker starts a daemon thread on its first request, but only the worker
+holding an exclusive lock on instance/maintenance.lock runs jobs; the others
+retry the lock each interval, so another worker takes over if the leader dies.
+Deletes run in small batches with a pause in between and each job stops at
+MAINTENANCE_JOB_BUDGET_SECONDS, so requests never queue behind a long
+write transaction. Last-run stats go to instance/maintenance.json so any worker
+can report them.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX dev machines
+    fcntl = None
+
+from flask import current_app
+from sqlalchemy import text
+
+from .models import db
+
+_started = False
+_start_lock = threading.Lock()
+_leader_file = None
+
+
+def init_app(app):
+    if not app.config["MAINTENANCE_ENABLED"]:
+        return
+
+    # Started from the first request, not create_app(), so CLI commands such
+    # as `flask db upgrade` never run jobs against a half-migrated database.
+    @app.before_request
+    def _start_maintenance():
+        global _started
+        if _started:
+            return
+        with _start_lock:
+            if _started:
+                return
+            _started = True
+            threading.Thread(target=_loop, args=(app,), daemon=True, name="maintenance").start()
+
+
+def _try_become_leader(app) -> bool:
+    global _leader_file
+    if _leader_file is not None:
+        return True
+    if fcntl is None:
+        return False
+    f = open(os.path.join(app.instance_path, "maintenance.lock"), "w")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    _leader_file = f  # held (and the lock with it) for the life of the process
+    return True
+
+
+def _loop(app):
+    time.sleep(app.config["MAINTENANCE_START_DELAY_SECONDS"])
+    while True:
+        try:
+            if _try_become_leader(app):
+                with app.app_context():
+                    run_once()
+        except Exception:
+            app.logger.exception("Maintenance run failed")
+        time.sleep(app.config["MAINTENANCE_INTERVAL_SECONDS"])
+
+
+def _stats_path() -> str:
+    return os.path.join(current_app.instance_path, "maintenance.json")
+
+
+def read_stats() -> dict:
+    try:
+        with open(_stats_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_stats(stats: dict):
+    path = _stats_path()
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _purge_in_batches(table: str, where: str, params: dict, cfg) -> dict:
+    """DELETE matching rows a batch at a time until done or out of budget."""
+    batch = cfg["MAINTENANCE_BATCH_SIZE"]
+    deadline = time.monotonic() + cfg["MAINTENANCE_JOB_BUDGET_SECONDS"]
+    deleted = 0
+    while True:
+        with db.engine.begin() as conn:
+            result = conn.execute(
+                text(f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE {where} LIMIT :batch)"),
+                {**params, "batch": batch},
+            )
+        deleted += result.rowcount
+        if result.rowcount < batch:
+            return {"deleted": deleted, "complete": True}
+        if time.monotonic() >= deadline:
+            return {"deleted": deleted, "complete": False}
+        time.sleep(cfg["MAINTENANCE_BATCH_PAUSE_SECONDS"])
+
+
+def purge_reset_tokens(cfg) -> dict:
+    return _purge_in_batches(
+        "password_reset_tokens",
+        "expires_at < :now OR used_at IS NOT NULL",
+        {"now": datetime.utcnow()},
+        cfg,
+    )
+
+
+def purge_processed_events(cfg) -> dict:
+    # Stripe retries a webhook for up to 3 days; older ids can't come back.
+    cutoff = datetime.utcnow() - timedelta(days=cfg["PROCESSED_EVENT_RETENTION_DAYS"])
+    return _purge_in_batches("processed_events", "created_at < :cutoff", {"cutoff": cutoff}, cfg)
+
+
+def sqlite_housekeeping(cfg) -> dict:
+    if db.engine.dialect.name != "sqlite":
+        return {"skipped": "not sqlite"}
+
+    result = {}
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA optimize")
+        result["optimized"] = True
+
+        # Only frees pages if the file was created with auto_vacuum=INCREMENTAL (2).
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(cfg['MAINTENANCE_VACUUM_PAGES'])})").fetchall()
+            result["incremental_vacuum_pages"] = cfg["MAINTENANCE_VACUUM_PAGES"]
+
+        if conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal":
+            # PASSIVE never waits on readers or writers.
+            busy, log_frames, checkpointed = conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").one()
+            result["wal_checkpoint"] = {"busy": busy, "log": log_frames, "checkpointed": checkpointed}
+        conn.commit()
+    return result
+
+
+JOBS = (
+    ("purge_reset_tokens", purge_reset_tokens),
+    ("purge_processed_events", purge_processed_events),
+    ("sqlite_housekeeping", sqlite_housekeeping),
+)
+
+
+def run_once() -> dict:
+    """Run every job once (needs an app context) and persist the stats."""
+    cfg = current_app.config
+
+    stats = {"started_at": datetime.utcnow().isoformat() + "Z", "pid": os.getpid(), "jobs": {}}
+    run_start = time.monotonic()
+    for name, job in JOBS:
+        job_start = time.monotonic()
+        try:
+            outcome = job(cfg)
+        except Exception as e:
+            current_app.logger.exception("Maintenance job %s failed", name)
+            outcome = {"error": type(e).__name__}
+        outcome["duration_ms"] = round((time.monotonic() - job_start) * 1000, 1)
+        stats["jobs"][name] = outcome
+    stats["duration_ms"] = round((time.monotonic() - run_start) * 1000, 1)
+
+    _write_stats(stats)
+    return stats
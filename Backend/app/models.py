@@ -15,6 +15,10 @@ class User(db.Model):
     tokensUsed  = db.Column(db.Integer, nullable=False, server_default="0")
     stripeID       = db.Column(db.String(255), nullable=True)
 
+    # Bumped on every write to the user's emails / exports; used as ETag validators.
+    emails_version  = db.Column(db.Integer, nullable=False, server_default="0")
+    exports_version = db.Column(db.Integer, nullable=False, server_default="0")
+
     def set_password(self, password: str):
         self.password_hash = generate_password_hash(password)
 
@@ -67,13 +71,103 @@ class Export(db.Model):
     payload_json = db.Column(db.String(255), nullable=False)
 
     email_sent = db.Column(db.Boolean, default=False)
+    row_count = db.Column(db.Integer, nullable=False, server_default="0")
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     user = db.relationship("User", backref="exports")
 
 
+class ExportRow(db.Model):
+    """
+    Row position of each scan key in an export's CSVs, used by delta exports,
+    plus the row's barcode/location for cross-export lookups.
+    """
+    __tablename__ = "export_rows"
+
+    id        = db.Column(db.Integer, primary_key=True)
+    export_pk = db.Column(db.Integer, db.ForeignKey("exports.id", ondelete="CASCADE"), nullable=False)
+    row_no    = db.Column(db.Integer, nullable=False)
+    row_key   = db.Column(db.String(255), nullable=False)
+    user_id   = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    barcode   = db.Column(db.String(255), nullable=True)   # first key field
+    location  = db.Column(db.String(255), nullable=True)   # forms.location_field()
+
+    __table_args__ = (
+        db.Index("ix_export_rows_export_key", "export_pk", "row_key"),
+        db.Index("ix_export_rows_user_barcode", "user_id", "barcode"),
+    )
+
+
+class Scan(db.Model):
+    """A scan synced from a device; scan_id is the id generated on the device."""
+    __tablename__ = "scans"
+
+    id         = db.Column(db.Integer, primary_key=True)
+    user_id    = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    scan_id    = db.Column(db.String(64), nullable=False)
+    form_id    = db.Column(db.String(64), nullable=False)
+    key        = db.Column(db.String(255), nullable=False)
+    data       = db.Column(db.Text, nullable=False)  # JSON string of field values
+    scanned_at = db.Column(db.DateTime, nullable=False)
+    export_id  = db.Column(db.String(64), nullable=True)  # set once exported
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "scan_id", name="uq_user_scan"),
+        db.Index("ix_scans_user_form_export", "user_id", "form_id", "export_id"),
+    )
+
+    def as_export_row(self) -> dict:
+        """Same shape the app posts in /api/export 'rows'."""
+        return {
+            "id": self.scan_id,
+            "form_id": self.form_id,
+            "key": self.key,
+            "data": self.data,
+            "scanned_at": self.scanned_at.isoformat(timespec="milliseconds") + "Z",
+        }
+
+
 class ProcessedEvent(db.Model):
     __tablename__ = "processed_events"
     id = db.Column(db.Integer, primary_key=True)
     event_id = db.Column(db.String(255), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class UsageUserDay(db.Model):
+    """Per-user, per-day usage counters, kept up to date by app/usage.py."""
+    __tablename__ = "usage_user_days"
+
+    id              = db.Column(db.Integer, primary_key=True)
+    user_id         = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    day             = db.Column(db.Date, nullable=False)  # UTC
+    tokens_charged  = db.Column(db.Integer, nullable=False, server_default="0")
+    tokens_refunded = db.Column(db.Integer, nullable=False, server_default="0")
+    exports         = db.Column(db.Integer, nullable=False, server_default="0")
+    rows            = db.Column(db.Integer, nullable=False, server_default="0")
+    emails_sent     = db.Column(db.Integer, nullable=False, server_default="0")
+    emails_failed   = db.Column(db.Integer, nullable=False, server_default="0")
+
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "day", name="uq_usage_user_day"),
+    )
+
+
+class UsageDay(db.Model):
+    """The same counters summed over all users, in USAGE_SHARDS rows per day (user_id % USAGE_SHARDS)."""
+    __tablename__ = "usage_days"
+
+    id              = db.Column(db.Integer, primary_key=True)
+    day             = db.Column(db.Date, nullable=False)  # UTC
+    shard           = db.Column(db.Integer, nullable=False, server_default="0")
+    tokens_charged  = db.Column(db.Integer, nullable=False, server_default="0")
+    tokens_refunded = db.Column(db.Integer, nullable=False, server_default="0")
+    exports         = db.Column(db.Integer, nullable=False, server_default="0")
+    rows            = db.Column(db.Integer, nullable=False, server_default="0")
+    emails_sent     = db.Column(db.Integer, nullable=False, server_default="0")
+    emails_failed   = db.Column(db.Integer, nullable=False, server_default="0")
+
+    __table_args__ = (
+        db.UniqueConstraint("day", "shard", name="uq_usage_day_shard"),
+    )
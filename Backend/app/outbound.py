@@ -0,0 +1,273 @@
+"""
+Outbound HTTP to Stripe and Resend.
+
+Each provider gets one keep-alive connection pool per process, explicit
+(connect, read) timeouts, a retry budget and a circuit breaker. The SDKs are
+configured once at startup to use these clients; routes keep calling
+stripe.* / resend.* as before.
+
+- Timeouts: a hung provider costs at most connect + read seconds per attempt.
+- Retries: only where safe (Stripe sends idempotency keys; Resend emails are
+  retried only when the request never reached the server, or on 429), and
+  never more than the budget allows, so retries can't multiply load on a
+  provider that is already struggling.
+- Circuit breaker: after BREAKER_FAILURE_THRESHOLD consecutive failures
+  (connection errors, timeouts, 5xx) calls fail immediately for
+  BREAKER_RESET_SECONDS, then a single probe decides whether to close it.
+  State is per process; see states() and GET /api/admin/outbound.
+"""
+import random
+import threading
+import time
+
+import requests
+import resend
+import stripe
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+_RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._counts = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def before_call(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._state = self.HALF_OPEN
+            if self._state == self.OPEN or (self._state == self.HALF_OPEN and self._probe_in_flight):
+                self._counts["rejected"] += 1
+                raise CircuitOpenError("circuit open")
+            if self._state == self.HALF_OPEN:
+                self._probe_in_flight = True
+            self._counts["calls"] += 1
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._counts["failures"] += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._counts["opened"] += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._state == self.OPEN
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = None
+            if self._state == self.OPEN:
+                retry_in = max(0.0, round(self.reset_seconds - (time.monotonic() - self._opened_at), 1))
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "retry_in_seconds": retry_in,
+                **self._counts,
+            }
+
+
+class RetryBudget:
+    """Each call earns `ratio` of a retry and each retry spends one, up to `burst` saved."""
+
+    def __init__(self, ratio: float, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            return round(self._tokens, 2)
+
+
+def _never_sent(error) -> bool:
+    """True if the connection failed before any of the request went out."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class Provider:
+    """Pooled session, timeouts, retry budget and breaker for one upstream API."""
+
+    def __init__(self, name: str, connect_timeout: float, read_timeout: float, max_retries: int,
+                 pool_size: int, breaker: CircuitBreaker, budget: RetryBudget):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.breaker = breaker
+        self.budget = budget
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def send(self, method: str, url: str, idempotent: bool = False, **kwargs) -> requests.Response:
+        """
+        One logical call. Connection failures that happened before the request
+        was sent and 429s are always retried; read timeouts and 5xx only when
+        `idempotent`.
+        """
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            self.budget.deposit()
+            # Every outcome ends in record_success/record_failure, which also
+            # releases a half-open probe; a stuck probe would block all calls.
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except requests.RequestException as e:  # connect/read errors, timeouts, broken bodies
+                self.breaker.record_failure()
+                if not self._may_retry(attempt, _never_sent(e) or idempotent):
+                    raise
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                retryable = response.status_code in _RETRY_STATUSES and (
+                    idempotent or response.status_code == 429
+                )
+                if not retryable or not self._may_retry(attempt, True):
+                    return response
+            attempt += 1
+            time.sleep(min(2.0, 0.25 * 2 ** attempt) * random.uniform(0.5, 1.0))
+
+    def _may_retry(self, attempt: int, safe: bool) -> bool:
+        return safe and attempt < self.max_retries and not self.breaker.is_open and self.budget.withdraw()
+
+    def state(self) -> dict:
+        return {
+            **self.breaker.snapshot(),
+            "connect_timeout": self.timeout[0],
+            "read_timeout": self.timeout[1],
+            "max_retries": self.max_retries,
+            "retry_budget": self.budget.tokens,
+        }
+
+
+class _StripeClient(stripe.RequestsClient):
+    """
+    Stripe's own client (it adds idempotency keys and honours
+    Stripe-Should-Retry) on our pooled session, timeouts, budget and breaker.
+    """
+
+    def __init__(self, provider: Provider):
+        super().__init__(timeout=provider.timeout, session=provider.session)
+        self._provider = provider
+
+    def request(self, method, url, headers, post_data=None):
+        try:
+            self._provider.breaker.before_call()
+        except CircuitOpenError:
+            raise stripe.APIConnectionError("Stripe is unavailable (circuit open).", should_retry=False)
+        self._provider.budget.deposit()
+        try:
+            response = super().request(method, url, headers, post_data)
+        except Exception:  # APIConnectionError, or anything else: never leave a probe in flight
+            self._provider.breaker.record_failure()
+            raise
+        if response[1] >= 500:
+            self._provider.breaker.record_failure()
+        else:
+            self._provider.breaker.record_success()
+        return response
+
+    def _should_retry(self, response, api_connection_error, num_retries, max_network_retries):
+        return (
+            super()._should_retry(response, api_connection_error, num_retries, max_network_retries)
+            and not self._provider.breaker.is_open
+            and self._provider.budget.withdraw()
+        )
+
+
+class _ResendClient(resend.HTTPClient):
+    def __init__(self, provider: Provider):
+        self._provider = provider
+
+    def request(self, method, url, headers, json=None):
+        try:
+            response = self._provider.send(method, url, idempotent=method.upper() == "GET",
+                                           headers=headers, json=json)
+        except requests.RequestException as e:
+            # resend.Request turns this into a ResendError, like its own client does
+            raise RuntimeError(f"Request failed: {e}") from e
+        return response.content, response.status_code, response.headers
+
+
+_providers = {}
+
+
+def _provider(cfg, name: str, prefix: str) -> Provider:
+    return Provider(
+        name,
+        connect_timeout=cfg[f"{prefix}_CONNECT_TIMEOUT"],
+        read_timeout=cfg[f"{prefix}_READ_TIMEOUT"],
+        max_retries=cfg[f"{prefix}_MAX_RETRIES"],
+        pool_size=cfg["OUTBOUND_POOL_SIZE"],
+        breaker=CircuitBreaker(cfg["BREAKER_FAILURE_THRESHOLD"], cfg["BREAKER_RESET_SECONDS"]),
+        budget=RetryBudget(cfg["RETRY_BUDGET_RATIO"]),
+    )
+
+
+def init_app(app):
+    """Point the Stripe and Resend SDKs at the shared clients and set their keys once."""
+    cfg = app.config
+    _providers["stripe"] = _provider(cfg, "stripe", "STRIPE")
+    _providers["resend"] = _provider(cfg, "resend", "RESEND")
+
+    stripe.default_http_client = _StripeClient(_providers["stripe"])
+    stripe.max_network_retries = cfg["STRIPE_MAX_RETRIES"]
+    if cfg.get("STRIPE_API_KEY"):
+        stripe.api_key = cfg["STRIPE_API_KEY"]
+
+    resend.default_http_client = _ResendClient(_providers["resend"])
+    if cfg.get("RESEND_API_KEY"):
+        resend.api_key = cfg["RESEND_API_KEY"]
+
+
+def states() -> dict:
+    """Breaker and budget state per provider, for monitoring."""
+    return {name: provider.state() for name, provider in _providers.items()}
@@ -1,22 +1,102 @@
-# app/pages.py
-from flask import Blueprint, render_template, request
+import hashlib
+import os
+
+from flask import Blueprint, abort, current_app, render_template, request, send_from_directory
 
 pages_bp = Blueprint("pages", __name__, template_folder="templates")
 
+# endpoint -> template for pages with no per-request content
+STATIC_PAGES = {
+    "pages.home": "index.html",
+    "pages.tokens_success": "tokens_success.html",
+    "pages.tokens_cancel": "tokens_cancel.html",
+}
+
+ONE_YEAR = 365 * 24 * 3600
+
+
+@pages_bp.record_once
+def _prerender(state):
+    """
+    Render the static pages once at startup into content-hashed files under
+    instance/pages (e.g. index.3f2a9c1d04be.html) and keep them in memory.
+    """
+    app = state.app
+    folder = os.path.join(app.instance_path, "pages")
+    os.makedirs(folder, exist_ok=True)
+
+    rendered = {}
+    with app.app_context():
+        for endpoint, template in STATIC_PAGES.items():
+            body = render_template(template).encode("utf-8")
+            digest = hashlib.sha256(body).hexdigest()[:12]
+            stem, ext = os.path.splitext(template)
+            filename = f"{stem}.{digest}{ext}"
+            path = os.path.join(folder, filename)
+            if not os.path.isfile(path):
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(body)
+                os.replace(tmp, path)
+            rendered[endpoint] = {"body": body, "etag": digest, "filename": filename}
+
+        app.extensions["static_pages"] = {
+            "folder": folder,
+            "pages": rendered,
+            "filenames": {page["filename"] for page in rendered.values()},
+            # compiled once; /reset only fills in the token
+            "reset_template": app.jinja_env.get_template("reset_password.html"),
+        }
+
+
+def _static_page(endpoint: str):
+    state = current_app.extensions["static_pages"]
+    page = state["pages"][endpoint]
+
+    accel_prefix = current_app.config.get("PAGES_ACCEL_REDIRECT_PREFIX")
+    if accel_prefix:
+        # Let the proxy serve the pre-rendered file straight from instance/pages.
+        response = current_app.response_class(mimetype="text/html")
+        response.headers["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + page["filename"]
+    else:
+        response = current_app.response_class(page["body"], mimetype="text/html")
+
+    response.set_etag(page["etag"])
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["PAGES_MAX_AGE"]
+    return response.make_conditional(request)
+
+
+@pages_bp.route("/pages/<path:filename>")
+def prerendered_page(filename):
+    """Content-hashed copies of the static pages; safe to cache forever."""
+    state = current_app.extensions["static_pages"]
+    if filename not in state["filenames"]:
+        abort(404)
+    response = send_from_directory(state["folder"], filename, max_age=ONE_YEAR)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
 @pages_bp.route("/reset", methods=["GET"])
 def reset_password_page():
     token = request.args.get("token", "")
-    return render_template("reset_password.html", token=token)
+    template = current_app.extensions["static_pages"]["reset_template"]
+    response = current_app.response_class(template.render(token=token), mimetype="text/html")
+    # The page embeds a one-time reset token.
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
 @pages_bp.route("/tokens/success")
 def tokens_success():
-    return render_template("tokens_success.html")
+    return _static_page("pages.tokens_success")
 
 @pages_bp.route("/tokens/cancel")
 def tokens_cancel():
-    return render_template("tokens_cancel.html")
+    return _static_page("pages.tokens_cancel")
 
 
 @pages_bp.route("/")
 def home():
-    return render_template("index.html")
\ No newline at end of file
+    return _static_page("pages.home")
@@ -2,16 +2,14 @@ from __future__ import annotations
 
 import re
 import os
-import csv
 import json
-import base64
 import hmac
 import hashlib
 import secrets
 from datetime import datetime, timedelta
 
 from email_validator import validate_email, EmailNotValidError
-from flask import Blueprint, jsonify, request, current_app, send_from_directory, abort
+from flask import Blueprint, jsonify, request, current_app, send_file, send_from_directory, abort
 from flask_jwt_extended import (
     create_access_token,
     jwt_required,
@@ -23,11 +21,32 @@ from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from werkzeug.utils import secure_filename
 import resend
 import stripe
-from sqlalchemy import text
+from sqlalchemy import text, insert
 
 
-from .models import db, User, Email, PasswordResetToken, Export, ProcessedEvent
+from .models import db, User, Email, PasswordResetToken, Export, ExportRow, ProcessedEvent
 from . import limiter as app_limiter  # use the Limiter initialized in __init__
+from .exports import (
+    apply_delta,
+    apply_duplicate_rules,
+    discard_staged,
+    drop_backups,
+    export_lock,
+    index_entries,
+    parse_rows,
+    publish_staged,
+    render_pool,
+    restore_published,
+    write_export_files,
+)
+from .forms import get_form, key_fields, location_field
+from .validation import validate_rows
+from .scans import parse_sync_body, upsert_scans, claim_pending_scans, release_scans
+from .wire import decode_body, is_columnar, columnar_rows, columnar_length
+from .compression import read_body
+from .etags import versioned_json
+from . import filecache, maintenance, outbound, usage
+from .db_routing import read_only
 
 bp = Blueprint("api", __name__)
 
@@ -47,6 +66,14 @@ def _get_current_user_from_jwt():
     except (TypeError, ValueError):
         return User.query.filter_by(username=str(ident)).first()
 
+def _current_admin():
+    """The current user if their username is listed in ADMIN_USERNAMES, else None."""
+    admins = {u.strip() for u in current_app.config["ADMIN_USERNAMES"].split(",") if u.strip()}
+    user = _get_current_user_from_jwt()
+    if user and user.username in admins:
+        return user
+    return None
+
 def _tokens_left(user: User) -> int:
     total = int(user.tokensTotal or 0)
     used  = int(user.tokensUsed or 0)
@@ -68,20 +95,68 @@ def _charge_tokens(user: User, cost: int = 1) -> bool:
                 {"cost": cost, "uid": user.id},
             )
             # rows affected == 1 => success
-            return result.rowcount == 1
+            if result.rowcount != 1:
+                return False
+            usage.record(conn, user.id, tokens_charged=cost)
+            return True
     except Exception:
         current_app.logger.exception("Atomic charge failed")
         return False
 
 def _refund_tokens(user: User, cost: int = 1):
     """Best-effort: subtract previously charged tokens if something failed later."""
+    # Drop whatever the failed request left in the session, so the refund's
+    # commit can't persist half-done work along with it.
+    db.session.rollback()
     try:
-        used = int(user.tokensUsed or 0)
-        user.tokensUsed = max(used - cost, 0)
+        # Conditional UPDATE like _charge_tokens; user.tokensUsed may be stale here.
+        db.session.execute(
+            text("""
+                UPDATE users
+                SET tokensUsed = CASE WHEN tokensUsed >= :cost THEN tokensUsed - :cost ELSE 0 END
+                WHERE id = :uid
+            """),
+            {"cost": cost, "uid": user.id},
+        )
+        usage.record(db.session, user.id, tokens_refunded=cost)
         db.session.commit()
     except Exception:
         current_app.logger.exception("Failed to refund tokens")
 
+def _release_claim(scan_pks: list, export_id):
+    """Best-effort: make scans claimed by a failed export pending again."""
+    if not scan_pks:
+        return
+    db.session.rollback()
+    try:
+        release_scans(scan_pks, export_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Failed to release claimed scans")
+
+def _unexported_scans(claimed: dict, rows: list) -> list:
+    """Pks of claimed scans that did not make it into rows (invalid, duplicate or merged)."""
+    exported = {row.get("id") for row in rows}
+    return [pk for scan_id, pk in claimed.items() if scan_id not in exported]
+
+def _record_usage(user_id: int, **counts):
+    """Best-effort usage rollup in its own commit, for work that writes nothing else."""
+    try:
+        usage.record(db.session, user_id, **counts)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("Failed to record usage")
+
+
+def _bump_version(user_id, column: str):
+    """Invalidate a user's cached GET responses (ETags) in the caller's transaction."""
+    col = getattr(User, column)
+    User.query.filter_by(id=user_id).update({col: col + 1}, synchronize_session=False)
+
+def _read_version(user_id, column: str):
+    return db.session.query(getattr(User, column)).filter_by(id=user_id).scalar()
 
 def _json_error(message: str, code: int = 400):
     return jsonify(error=message), code
@@ -93,14 +168,18 @@ def _get_json():
         data = request.form.to_dict()
     return data or {}
 
-def _csv_safe(value):
-    """Mitigate CSV injection: prefix dangerous leading chars with a single quote."""
-    if value is None:
-        return ""
-    s = str(value)
-    if s[:1] in ("=", "+", "-", "@"):
-        return "'" + s
-    return s
+def _read_body() -> bytes:
+    """Request body with Content-Encoding (gzip/zstd) decoded and size limits applied."""
+    return read_body(
+        current_app.config["MAX_PAYLOAD_BYTES"],
+        current_app.config["MAX_DECOMPRESSED_BYTES"],
+    )
+
+def _split_headers(headers_str) -> list:
+    """Parse a form's csvHeader ("a, b") into a list of column names."""
+    if not isinstance(headers_str, str):
+        return []
+    return [h.strip() for h in headers_str.split(",") if h.strip()]
 
 def _save_payload_json(export_id: str, payload: dict) -> str:
     folder = _export_folder()
@@ -110,12 +189,12 @@ def _save_payload_json(export_id: str, payload: dict) -> str:
     return path
 
 def encode_attachment(file_path):
-    with open(file_path, "rb") as f:
-        content = f.read()
-        return {
-            "filename": os.path.basename(file_path),
-            "content": base64.b64encode(content).decode("utf-8"),
-        }
+    # Served from / added to the shared export cache, so a resend right after
+    # the export doesn't re-read and re-encode the file.
+    return {
+        "filename": os.path.basename(file_path),
+        "content": filecache.encode_file(file_path),
+    }
 
 def _hash_token(raw: str) -> str:
     key = (current_app.config.get("SECRET_KEY") or "").encode("utf-8")
@@ -273,6 +352,7 @@ def reset_password_confirm():
 
 @bp.route("/getUserTokens", methods=["GET"])
 @jwt_required()
+@read_only
 def get_user_tokens():
     ident = get_jwt_identity()
 
@@ -299,11 +379,17 @@ def get_user_tokens():
 
     tokens_left = max(tokens_total - tokens_used, 0)
 
-    return jsonify({
-        "tokensTotal": tokens_total,
-        "tokensLeft": tokens_left,
-        "tokensUsed": tokens_used,
-    }), 200
+    # The balance itself is the validator: it changes on every charge/refund/credit.
+    return versioned_json(
+        "tokens",
+        user.id,
+        f"{tokens_total}.{tokens_used}",
+        lambda: ({
+            "tokensTotal": tokens_total,
+            "tokensLeft": tokens_left,
+            "tokensUsed": tokens_used,
+        }, 200),
+    )
 
 @bp.route("/getMoreTokens", methods=["POST"])
 @jwt_required()
@@ -320,11 +406,9 @@ def get_more_tokens():
     }
     """
     # --- config / pricing ---
-    stripe_key = os.getenv("STRIPE_API_KEY")     
-
-    if not stripe_key:
+    # stripe.api_key and its HTTP client are set once in outbound.init_app()
+    if not current_app.config.get("STRIPE_API_KEY"):
         return _json_error("Stripe key not configured on server.", 500)
-    stripe.api_key = stripe_key
 
     TOKEN_PRICE_CENTS = int(current_app.config.get("TOKEN_PRICE_CENTS", 10))  # $0.10/token
     from flask import url_for
@@ -393,20 +477,24 @@ def get_more_tokens():
         }
 
     # --- create checkout session ---
-    session = stripe.checkout.Session.create(
-        mode="payment",
-        payment_method_types=["card"],
-        line_items=[line_item],
-        allow_promotion_codes=True,
-        success_url=success_url,
-        cancel_url=cancel_url,
-        customer_email=customer_email,
-        metadata={
-            "user_id": str(user.id),
-            "username": user.username,
-            "price_per_token_cents": str(TOKEN_PRICE_CENTS),
-        },
-    )
+    try:
+        session = stripe.checkout.Session.create(
+            mode="payment",
+            payment_method_types=["card"],
+            line_items=[line_item],
+            allow_promotion_codes=True,
+            success_url=success_url,
+            cancel_url=cancel_url,
+            customer_email=customer_email,
+            metadata={
+                "user_id": str(user.id),
+                "username": user.username,
+                "price_per_token_cents": str(TOKEN_PRICE_CENTS),
+            },
+        )
+    except stripe.error.APIConnectionError:
+        current_app.logger.exception("Stripe unavailable")
+        return _json_error("Payment provider unavailable. Please try again shortly.", 503)
 
     # --- best-effort email with Resend (optional) ---
     emailed = False
@@ -443,9 +531,8 @@ def stripe_webhook():
     payload = request.get_data()        # do not read body elsewhere before this
     sig_header = request.headers.get("Stripe-Signature")
     secret = current_app.config.get("STRIPE_WEBHOOK_SECRET")
-    stripe.api_key = current_app.config.get("STRIPE_API_KEY")
 
-    if not secret or not stripe.api_key:
+    if not secret or not current_app.config.get("STRIPE_API_KEY"):
         current_app.logger.error("Stripe keys not configured")
         return "Stripe keys not configured", 500
 
@@ -468,8 +555,9 @@ def stripe_webhook():
             line_items = stripe.checkout.Session.list_line_items(session["id"], limit=100)
             qty = sum(li["quantity"] or 0 for li in line_items["data"])
         except Exception:
+            # Not marked processed: Stripe redelivers the event until it is credited
             current_app.logger.exception("Failed to fetch line items")
-            qty = 0
+            return "Failed to fetch line items", 503
 
         user_id = session.get("metadata", {}).get("user_id")
         if user_id and qty > 0:
@@ -491,23 +579,26 @@ def stripe_webhook():
 # --------------------------------------------------------------------------- #
 @bp.route("/emails", methods=["GET"])
 @jwt_required()
+@read_only
 def get_emails():
     user_id = get_jwt_identity()
-    emails  = (
-        Email.query.filter_by(user_id=user_id)
-        .order_by(Email.id.asc())
-        .all()
-    )
 
-    if not emails:
-        return jsonify(message="No emails found."), 200
+    def build():
+        emails  = (
+            Email.query.filter_by(user_id=user_id)
+            .order_by(Email.id.asc())
+            .all()
+        )
 
-    return jsonify(
-        [
+        if not emails:
+            return {"message": "No emails found."}, 200
+
+        return [
             {"id": e.id, "email": e.email, "is_active": e.is_active}
             for e in emails
-        ]
-    ), 200
+        ], 200
+
+    return versioned_json("emails", user_id, _read_version(user_id, "emails_version"), build)
 
 @bp.route("/emails", methods=["POST"])
 @jwt_required()
@@ -527,6 +618,7 @@ def add_email():
     try:
         new_email = Email(user_id=user_id, email=valid_email, is_active=False)
         db.session.add(new_email)
+        _bump_version(user_id, "emails_version")
         db.session.commit()
     except IntegrityError:
         db.session.rollback()
@@ -552,6 +644,7 @@ def set_active_email(email_id: int):
             {"is_active": False}
         )
         email.is_active = True
+        _bump_version(user_id, "emails_version")
         db.session.commit()
     except SQLAlchemyError:
         db.session.rollback()
@@ -570,6 +663,7 @@ def remove_email(email_id: int):
 
     try:
         db.session.delete(email)
+        _bump_version(user_id, "emails_version")
         db.session.commit()
     except SQLAlchemyError:
         db.session.rollback()
@@ -597,106 +691,159 @@ def export_data():
     if not charged:
         return _json_error("No tokens left. Please purchase more tokens.", 402)
 
+    claimed, claim_id = {}, None  # source="scans": {scan id: pk} claimed for export claim_id
     try:
         user_id = user.id
 
-        # Size check
-        raw_len = request.content_length or 0
-        if raw_len > current_app.config["MAX_PAYLOAD_BYTES"]:
-            raise ValueError("Payload too large.")
-
-        # Parse JSON
-        try:
-            payload = request.get_json(force=True, silent=False)
-        except Exception:
-            raise ValueError("Invalid JSON body.")
+        # Size checks (wire and decompressed) + parse: JSON (row or columnar
+        # shape), or MessagePack by Content-Type
+        payload = decode_body(_read_body(), request.mimetype)
 
         export_id = payload.get("exportId") or datetime.utcnow().strftime("%Y%m%d%H%M%S")
 
+        # Delta mode: only new/updated rows are sent and merged into a base export
+        base_export = None
+        base_export_id = payload.get("baseExportId")
+        if base_export_id:
+            base_export = Export.query.filter_by(export_id=str(base_export_id), user_id=user_id).first()
+            if not base_export:
+                raise ValueError("Base export not found.")
+            payload_name = f"{base_export.export_id}_delta_{export_id}"
+        else:
+            payload_name = export_id
+
+        headers_str = payload.get("headers", "")
+        rows = payload.get("rows", [])
+        form_id = payload.get("formId") or (base_export.form_id if base_export else None)
+        max_rows = current_app.config["MAX_EXPORT_ROWS"]
+
+        # source="scans": export the user's synced, not-yet-exported scans.
+        # They are claimed for this export up front and released again if
+        # they are dropped below or the export fails.
+        if payload.get("source") == "scans":
+            if not form_id:
+                raise ValueError("Field 'formId' is required to export stored scans.")
+            claim_id = base_export.export_id if base_export else export_id
+            claimed, rows = claim_pending_scans(user_id, form_id, max_rows, claim_id)
+            payload = {**payload, "rows": rows}
+
         # Save raw payload JSON
         try:
-            payload_path = _save_payload_json(export_id, payload)
+            payload_path = _save_payload_json(payload_name, payload)
         except Exception:
             current_app.logger.exception("Failed to save payload JSON")
             raise RuntimeError("Failed to persist payload.")
 
-        headers_str = payload.get("headers", "")
-        rows = payload.get("rows", [])
-        form_id = payload.get("formId") or None
-
         if not isinstance(rows, list):
             raise ValueError("Field 'rows' must be a list.")
 
-        max_rows = current_app.config["MAX_EXPORT_ROWS"]
-        if not rows:
+        columnar = is_columnar(payload)
+        row_total = columnar_length(payload) if columnar else len(rows)
+        if not row_total:
             raise ValueError("No rows to export.")
-        if len(rows) > max_rows:
+        if row_total > max_rows:
             raise ValueError(f"Too many rows (>{max_rows}).")
 
         # Build CSV data
-        minimal_headers = [h.strip() for h in headers_str.split(",") if isinstance(h, str) and h.strip()]
-        full_fieldnames = set()
-        parsed_rows = []
-
-        for row in rows:
-            if not isinstance(row, dict):
-                continue
-            try:
-                data_obj = row.get("data")
-                if isinstance(data_obj, str):
-                    data_obj = json.loads(data_obj)
-                elif data_obj is None:
-                    data_obj = {}
-                merged = {
-                    **(data_obj if isinstance(data_obj, dict) else {}),
-                    "id": row.get("id"),
-                    "form_id": row.get("form_id"),
-                    "scanned_at": row.get("scanned_at"),
-                }
-                parsed_rows.append(merged)
-                full_fieldnames.update(merged.keys())
-            except Exception:
-                continue
-
+        minimal_headers = _split_headers(headers_str)
+        malformed = []
+        if columnar:
+            parsed_rows, full_fieldnames = columnar_rows(payload)
+        else:
+            parsed_rows, full_fieldnames = parse_rows(rows, malformed)
+
+        # Field specs from forms.json (required / minLength / maxLength)
+        form = get_form(form_id)
+        form_key_fields = key_fields(form)
+        parsed_rows, invalid_summary = validate_rows(parsed_rows, form, malformed)
         if not parsed_rows:
             raise ValueError("No valid rows after parsing.")
 
-        folder = _export_folder()
-        minimal_csv_name = f"{export_id}_minimal.csv"
-        full_csv_name    = f"{export_id}_full.csv"
-
-        minimal_csv_path = os.path.join(folder, minimal_csv_name)
-        full_csv_path    = os.path.join(folder, full_csv_name)
-
-        # Minimal CSV
-        try:
-            with open(minimal_csv_path, mode="w", newline="", encoding="utf-8") as f:
-                fieldnames = minimal_headers or sorted(full_fieldnames)
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                for row in parsed_rows:
-                    writer.writerow({k: _csv_safe(row.get(k, "")) for k in fieldnames})
-        except Exception:
-            current_app.logger.exception("Failed writing minimal CSV")
-            raise RuntimeError("Failed to generate minimal CSV.")
-
-        # Full CSV
-        try:
-            with open(full_csv_path, mode="w", newline="", encoding="utf-8") as f:
-                fieldnames = sorted(full_fieldnames)
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                for row in parsed_rows:
-                    writer.writerow({k: _csv_safe(row.get(k, "")) for k in fieldnames})
-        except Exception:
-            current_app.logger.exception("Failed writing full CSV")
-            raise RuntimeError("Failed to generate full CSV.")
+        # Server-side duplicate rules from forms.json (rows from several devices)
+        parsed_rows, duplicate_summary = apply_duplicate_rules(parsed_rows, form)
+        if not parsed_rows:
+            raise ValueError("No valid rows after duplicate checks.")
 
-        # Email active email
+        # Last check that can reject the request; nothing is written before it
         active_email = Email.query.filter_by(user_id=user_id, is_active=True).first()
         if not active_email:
             raise ValueError("No active email on file.")
 
+        folder = _export_folder()
+        delta = None
+
+        if base_export:
+            export_id = base_export.export_id
+            minimal_csv_name = base_export.minimal_csv
+            full_csv_name    = base_export.full_csv
+            minimal_csv_path = os.path.join(folder, minimal_csv_name)
+            full_csv_path    = os.path.join(folder, full_csv_name)
+
+            # The lock is held from reading the export until its files are
+            # replaced, so concurrent deltas on one base apply one after another.
+            try:
+                with export_lock(folder, export_id):
+                    base_export = (
+                        Export.query.filter_by(id=base_export.id)
+                        .populate_existing()
+                        .with_for_update()
+                        .one()
+                    )
+                    delta = apply_delta(
+                        folder,
+                        base_export,
+                        parsed_rows,
+                        full_fieldnames,
+                        form_key_fields,
+                        on_duplicate=(form or {}).get("handleDuplicateKey", "update"),
+                        location_field=location_field(form),
+                    )
+                    try:
+                        if delta["index"]:
+                            db.session.execute(insert(ExportRow), delta["index"])
+                        if claimed:
+                            release_scans(_unexported_scans(claimed, parsed_rows), claim_id)
+                        usage.record(db.session, user_id, exports=1, rows=len(parsed_rows))
+                        db.session.flush()
+                    except Exception:
+                        discard_staged(delta["staged"])
+                        raise
+                    # Files first, then the index: a failed commit puts the old files back
+                    backups = publish_staged(delta["staged"])
+                    try:
+                        db.session.commit()
+                    except Exception:
+                        restore_published(backups)
+                        raise
+                    drop_backups(backups)
+                    claimed = {}  # exported; nothing to release from here on
+            except (ValueError, RuntimeError):
+                raise
+            except Exception:
+                current_app.logger.exception("Failed applying delta export")
+                raise RuntimeError("Failed to update export CSVs.")
+        else:
+            minimal_csv_name = f"{export_id}_minimal.csv"
+            full_csv_name    = f"{export_id}_full.csv"
+            minimal_csv_path = os.path.join(folder, minimal_csv_name)
+            full_csv_path    = os.path.join(folder, full_csv_name)
+
+            # Minimal + full CSV (chunked on the process pool for very large exports)
+            try:
+                write_export_files(
+                    folder,
+                    export_id,
+                    minimal_headers,
+                    full_fieldnames,
+                    parsed_rows,
+                    processes=current_app.config["EXPORT_RENDER_PROCESSES"],
+                    parallel_threshold=current_app.config["EXPORT_PARALLEL_THRESHOLD"],
+                )
+            except Exception:
+                current_app.logger.exception("Failed writing CSVs")
+                raise RuntimeError("Failed to generate CSV files.")
+
+        # Email active email
         try:
             params: resend.Emails.SendParams = {
                 "from": "Scan App <noreply@scans.omnaris.xyz>",
@@ -725,7 +872,7 @@ def export_data():
                                         <td style="padding: 8px; border: 1px solid #ddd;">Full CSV export</td>
                                     </tr>
                                     <tr>
-                                        <td style="padding: 8px; border: 1px solid #ddd;">{export_id}.json</td>
+                                        <td style="padding: 8px; border: 1px solid #ddd;">{payload_name}.json</td>
                                         <td style="padding: 8px; border: 1px solid #ddd;">Raw JSON data</td>
                                     </tr>
                                 </tbody>
@@ -749,40 +896,408 @@ def export_data():
             current_app.logger.exception("Failed to send export email")
             email_sent = False
 
-        # Store in DB
-        export_record = Export(
-            export_id=export_id,
-            user_id=user_id,
-            form_id=form_id,
-            minimal_csv=minimal_csv_name,
-            full_csv=full_csv_name,
-            payload_json=f"{export_id}.json",
-            email_sent=email_sent,
-        )
-        db.session.add(export_record)
-        db.session.commit()
+        # Store in DB (export record + row index in one transaction)
+        if base_export:
+            # The delta itself is already committed; don't refund it over this.
+            try:
+                base_export.email_sent = email_sent
+                usage.record(db.session, user_id, emails_sent=int(email_sent), emails_failed=int(not email_sent))
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                current_app.logger.exception("Failed to record delta export email status")
+        else:
+            export_record = Export(
+                export_id=export_id,
+                user_id=user_id,
+                form_id=form_id,
+                minimal_csv=minimal_csv_name,
+                full_csv=full_csv_name,
+                payload_json=f"{export_id}.json",
+                email_sent=email_sent,
+                row_count=len(parsed_rows),
+            )
+            db.session.add(export_record)
+            db.session.flush()
+            db.session.execute(
+                insert(ExportRow),
+                index_entries(export_record, parsed_rows, form_key_fields, location_field=location_field(form)),
+            )
+            _bump_version(user_id, "exports_version")
+            if claimed:
+                release_scans(_unexported_scans(claimed, parsed_rows), claim_id)
+            usage.record(
+                db.session, user_id,
+                exports=1, rows=len(parsed_rows),
+                emails_sent=int(email_sent), emails_failed=int(not email_sent),
+            )
+            db.session.commit()
+            claimed = {}
 
-        return jsonify(
+        result = dict(
             message="Exported successfully" if email_sent else "Exported, but failed to send email.",
             export_id=export_id,
             minimal_csv=f"/api/exports/{export_id}/{minimal_csv_name}",
             full_csv=f"/api/exports/{export_id}/{full_csv_name}",
-            payload_json=f"/api/exports/{export_id}/{export_id}.json",
+            payload_json=f"/api/exports/{export_id}/{payload_name}.json",
             email_sent=email_sent,
-        ), 200
+        )
+        if invalid_summary:
+            result["invalid"] = invalid_summary
+        if duplicate_summary:
+            result["duplicates"] = duplicate_summary
+        if delta:
+            result.update(
+                appended=delta["appended"],
+                updated=delta["updated"],
+                row_count=delta["row_count"],
+            )
+        return jsonify(result), 200
 
     except ValueError as ve:
         # Bad request; refund the token
+        _release_claim(list(claimed.values()), claim_id)
         _refund_tokens(user, COST_EXPORT)
-        return _json_error(str(ve), 400)
+        return _json_error(str(ve), getattr(ve, "code", 400))
     except RuntimeError as re_err:
+        _release_claim(list(claimed.values()), claim_id)
         _refund_tokens(user, COST_EXPORT)
         return _json_error(str(re_err), 500)
     except Exception:
         current_app.logger.exception("Export failed")
+        _release_claim(list(claimed.values()), claim_id)
         _refund_tokens(user, COST_EXPORT)
         return _json_error("Export failed.", 500)
 
+@bp.route("/export/batch", methods=["POST"])
+@jwt_required()
+@app_limiter.limit("20/hour")
+def export_batch():
+    """
+    Export several forms in one request (e.g. inbound + location at end of shift).
+
+    Request body:
+    {
+      "exports": [
+        {"exportId": "...", "formId": "inbound", "headers": "parcelBarcode", "rows": [...]},
+        {"exportId": "...", "formId": "location", "headers": "...", "rows": [...]}
+      ]
+    }
+    A group may send columnar "fields"/"columns" instead of "rows" (see
+    app/wire.py), and the whole body may be MessagePack.
+    Each group becomes its own export with the same files as /export. CSVs are
+    rendered concurrently, all records are stored in one transaction, a single
+    email carries every file and the user is charged once for all groups.
+    """
+    user = _get_current_user_from_jwt()
+    if not user:
+        return _json_error("User not found.", 404)
+
+    try:
+        payload = decode_body(_read_body(), request.mimetype)
+    except ValueError as e:
+        return _json_error(str(e), getattr(e, "code", 400))
+    groups = payload.get("exports")
+    if not isinstance(groups, list) or not groups:
+        return _json_error("Field 'exports' must be a non-empty list.", 400)
+
+    max_groups = current_app.config["MAX_BATCH_EXPORTS"]
+    if len(groups) > max_groups:
+        return _json_error(f"Too many exports in batch (>{max_groups}).", 400)
+
+    # One ledger operation for the whole batch
+    cost = COST_EXPORT * len(groups)
+    if _tokens_left(user) < cost:
+        return _json_error("No tokens left. Please purchase more tokens.", 402)
+    if not _charge_tokens(user, cost):
+        return _json_error("No tokens left. Please purchase more tokens.", 402)
+
+    try:
+        user_id = user.id
+        max_rows = current_app.config["MAX_EXPORT_ROWS"]
+        stamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+
+        jobs = []
+        seen_ids = set()
+        for i, group in enumerate(groups):
+            if not isinstance(group, dict):
+                raise ValueError(f"exports[{i}] must be an object.")
+
+            export_id = str(group.get("exportId") or f"{stamp}_{i}")
+            if export_id in seen_ids:
+                raise ValueError(f"Duplicate exportId '{export_id}' in batch.")
+            seen_ids.add(export_id)
+
+            rows = group.get("rows", [])
+            if not isinstance(rows, list):
+                raise ValueError(f"exports[{i}]: field 'rows' must be a list.")
+            columnar = is_columnar(group)
+            row_total = columnar_length(group) if columnar else len(rows)
+            if not row_total:
+                raise ValueError(f"exports[{i}]: no rows to export.")
+            if row_total > max_rows:
+                raise ValueError(f"exports[{i}]: too many rows (>{max_rows}).")
+
+            malformed = []
+            if columnar:
+                parsed_rows, full_fieldnames = columnar_rows(group)
+            else:
+                parsed_rows, full_fieldnames = parse_rows(rows, malformed)
+            form_id = group.get("formId") or None
+            form = get_form(form_id)
+            parsed_rows, invalid_summary = validate_rows(parsed_rows, form, malformed)
+            parsed_rows, duplicate_summary = apply_duplicate_rules(parsed_rows, form)
+            if not parsed_rows:
+                raise ValueError(f"exports[{i}]: no valid rows after parsing.")
+
+            jobs.append({
+                "group": group,
+                "export_id": export_id,
+                "form_id": form_id,
+                "key_fields": key_fields(form),
+                "location_field": location_field(form),
+                "minimal_headers": _split_headers(group.get("headers", "")),
+                "full_fieldnames": full_fieldnames,
+                "rows": parsed_rows,
+                "invalid": invalid_summary,
+                "duplicates": duplicate_summary,
+            })
+
+        active_email = Email.query.filter_by(user_id=user_id, is_active=True).first()
+        if not active_email:
+            raise ValueError("No active email on file.")
+
+        folder = _export_folder()
+        try:
+            for job in jobs:
+                _save_payload_json(job["export_id"], job["group"])
+        except Exception:
+            current_app.logger.exception("Failed to save payload JSON")
+            raise RuntimeError("Failed to persist payload.")
+
+        # Render every group's CSVs concurrently
+        pool = render_pool(current_app.config["EXPORT_RENDER_WORKERS"])
+        futures = [
+            pool.submit(
+                write_export_files,
+                folder,
+                job["export_id"],
+                job["minimal_headers"],
+                job["full_fieldnames"],
+                job["rows"],
+                current_app.config["EXPORT_RENDER_PROCESSES"],
+                current_app.config["EXPORT_PARALLEL_THRESHOLD"],
+            )
+            for job in jobs
+        ]
+        try:
+            for job, future in zip(jobs, futures):
+                job["minimal_csv"], job["full_csv"] = future.result()
+        except Exception:
+            current_app.logger.exception("Failed writing batch CSVs")
+            raise RuntimeError("Failed to generate CSV files.")
+
+        # One consolidated email
+        file_rows = "".join(
+            f"""
+                                    <tr>
+                                        <td style="padding: 8px; border: 1px solid #ddd;">{name}</td>
+                                        <td style="padding: 8px; border: 1px solid #ddd;">{desc} ({job["form_id"] or "form"})</td>
+                                    </tr>"""
+            for job in jobs
+            for name, desc in (
+                (job["minimal_csv"], "Minimal CSV export"),
+                (job["full_csv"], "Full CSV export"),
+                (f"{job['export_id']}.json", "Raw JSON data"),
+            )
+        )
+        try:
+            params: resend.Emails.SendParams = {
+                "from": "Scan App <noreply@scans.omnaris.xyz>",
+                "to": active_email.email,
+                "subject": f"📦 Scan App Export ({len(jobs)} forms) @ {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}",
+                "html": f"""
+                    <div style="font-family: Arial, sans-serif; font-size: 16px; color: #333;">
+                        <h2 style="color: #007BFF;">📦 Your Scan Exports are Ready</h2>
+                        <p>Hello,</p>
+                        <p>Your requested exports have been generated successfully. You’ll find the files attached to this email.</p>
+                        <div style="margin-top: 20px;">
+                            <table style="border-collapse: collapse; width: 100%; max-width: 500px;">
+                                <thead>
+                                    <tr style="background-color: #f8f9fa; text-align: left;">
+                                        <th style="padding: 8px; border: 1px solid #ddd;">File</th>
+                                        <th style="padding: 8px; border: 1px solid #ddd;">Description</th>
+                                    </tr>
+                                </thead>
+                                <tbody>{file_rows}
+                                </tbody>
+                            </table>
+                        </div>
+                        <p style="margin-top: 20px;">If you did not request this export, please contact your administrator immediately.</p>
+                        <p style="color: #777; font-size: 12px; margin-top: 30px;">
+                            — Scan App Automated Export System
+                        </p>
+                    </div>
+                """,
+                "attachments": [
+                    encode_attachment(os.path.join(folder, name))
+                    for job in jobs
+                    for name in (job["minimal_csv"], job["full_csv"])
+                ],
+            }
+
+            resend.Emails.send(params)
+            email_sent = True
+        except Exception:
+            current_app.logger.exception("Failed to send batch export email")
+            email_sent = False
+
+        # Store every export and its row index in one transaction
+        records = []
+        for job in jobs:
+            record = Export(
+                export_id=job["export_id"],
+                user_id=user_id,
+                form_id=job["form_id"],
+                minimal_csv=job["minimal_csv"],
+                full_csv=job["full_csv"],
+                payload_json=f"{job['export_id']}.json",
+                email_sent=email_sent,
+                row_count=len(job["rows"]),
+            )
+            db.session.add(record)
+            records.append(record)
+        db.session.flush()
+        index = [
+            entry
+            for job, record in zip(jobs, records)
+            for entry in index_entries(record, job["rows"], job["key_fields"], location_field=job["location_field"])
+        ]
+        if index:
+            db.session.execute(insert(ExportRow), index)
+        _bump_version(user_id, "exports_version")
+        usage.record(
+            db.session, user_id,
+            exports=len(jobs), rows=sum(len(job["rows"]) for job in jobs),
+            emails_sent=int(email_sent), emails_failed=int(not email_sent),
+        )
+        db.session.commit()
+
+        results = []
+        for job in jobs:
+            export_id = job["export_id"]
+            item = dict(
+                export_id=export_id,
+                form_id=job["form_id"],
+                minimal_csv=f"/api/exports/{export_id}/{job['minimal_csv']}",
+                full_csv=f"/api/exports/{export_id}/{job['full_csv']}",
+                payload_json=f"/api/exports/{export_id}/{export_id}.json",
+            )
+            if job["invalid"]:
+                item["invalid"] = job["invalid"]
+            if job["duplicates"]:
+                item["duplicates"] = job["duplicates"]
+            results.append(item)
+
+        return jsonify(
+            message="Exported successfully" if email_sent else "Exported, but failed to send email.",
+            email_sent=email_sent,
+            exports=results,
+        ), 200
+
+    except ValueError as ve:
+        _refund_tokens(user, cost)
+        return _json_error(str(ve), 400)
+    except RuntimeError as re_err:
+        _refund_tokens(user, cost)
+        return _json_error(str(re_err), 500)
+    except Exception:
+        current_app.logger.exception("Batch export failed")
+        _refund_tokens(user, cost)
+        return _json_error("Export failed.", 500)
+
+@bp.route("/scans/sync", methods=["POST"])
+@jwt_required()
+@app_limiter.limit("120/hour")
+def sync_scans():
+    """
+    Upload scans from the device in batches.
+
+    Body is NDJSON (Content-Type: application/x-ndjson, one scan per line) or a
+    JSON list / {"scans": [...]}. Each scan mirrors the device record:
+    {"id", "formId", "key", "data", "scannedAt"}. Re-sending an id updates the
+    stored scan unless it was already exported.
+    """
+    user = _get_current_user_from_jwt()
+    if not user:
+        return _json_error("User not found.", 404)
+
+    ndjson = request.mimetype in ("application/x-ndjson", "application/ndjson")
+    try:
+        records, rejected, received = parse_sync_body(
+            user.id, _read_body(), ndjson, current_app.config["MAX_SYNC_SCANS"]
+        )
+    except ValueError as e:
+        return _json_error(str(e) or "Invalid body.", getattr(e, "code", 400))
+
+    try:
+        if records:
+            upsert_scans(records)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception("Scan sync failed")
+        return _json_error("Database error.", 500)
+
+    return jsonify(
+        received=received,
+        accepted=len(records),
+        rejected=rejected,
+    ), 200
+
+@bp.route("/scans/lookup", methods=["GET"])
+@jwt_required()
+@read_only
+def lookup_scan():
+    """
+    Find a barcode across all of the user's exports, newest first:
+    which export it is in, at which row, and its location (if the form has one).
+    """
+    user_id = get_jwt_identity()
+    barcode = (request.args.get("barcode") or "").strip()
+    if not barcode:
+        return _json_error("Query parameter 'barcode' is required.", 400)
+    if len(barcode) > 255:
+        return _json_error("Barcode too long.", 400)
+    try:
+        limit = min(max(int(request.args.get("limit", 50)), 1), 200)
+    except ValueError:
+        return _json_error("Query parameter 'limit' must be an integer.", 400)
+
+    matches = (
+        db.session.query(
+            Export.export_id, Export.form_id, Export.created_at, ExportRow.row_no, ExportRow.location
+        )
+        .join(Export, Export.id == ExportRow.export_pk)
+        .filter(ExportRow.user_id == user_id, ExportRow.barcode == barcode)
+        .order_by(Export.created_at.desc(), ExportRow.row_no)
+        .limit(limit)
+        .all()
+    )
+    return jsonify(
+        barcode=barcode,
+        matches=[
+            {
+                "export_id": export_id,
+                "form_id": form_id,
+                "exported_at": created_at.isoformat(timespec="seconds") + "Z",
+                "row": row_no,
+                "location": location,
+            }
+            for export_id, form_id, created_at, row_no, location in matches
+        ],
+    ), 200
+
 @bp.route("/exports/resend/<export_id>", methods=["POST"])
 @jwt_required()
 def resend_export_email(export_id):
@@ -868,16 +1383,19 @@ def resend_export_email(export_id):
         }
 
         resend.Emails.send(params)
+        _record_usage(user.id, emails_sent=1)
         return jsonify({"message": "Export email re-sent successfully."}), 200
 
     except Exception:
         current_app.logger.exception("Failed to resend export email")
         _refund_tokens(user, COST_EXPORT)  # refund on failure
+        _record_usage(user.id, emails_failed=1)
         return _json_error("Failed to resend email.", 500)
 
 
 @bp.route("/exports/file/<export_id>/<path:filename>", methods=["GET"])
 @jwt_required()
+@read_only
 def download_export(export_id, filename):
     user = _get_current_user_from_jwt()
     if not user:
@@ -904,28 +1422,86 @@ def download_export(export_id, filename):
     if not charged:
         return _json_error("No tokens left. Please purchase more tokens.", 402)
 
+    cached = filecache.cached_path(path)
+    if cached:
+        return send_file(cached, as_attachment=True, download_name=filename)
     return send_from_directory(folder, filename, as_attachment=True)
 
 @bp.route("/exports", methods=["GET"])
 @jwt_required()
+@read_only
 def list_exports():
     """
     Return all export IDs belonging to the current user.
     """
     user_id = get_jwt_identity()
-    export_ids = (
-        db.session.query(Export.export_id)
-        .filter_by(user_id=user_id)
-        .order_by(Export.created_at.desc())
-        .all()
-    )
 
-    return jsonify([eid for (eid,) in export_ids]), 200
+    def build():
+        export_ids = (
+            db.session.query(Export.export_id)
+            .filter_by(user_id=user_id)
+            .order_by(Export.created_at.desc())
+            .all()
+        )
+        return [eid for (eid,) in export_ids], 200
 
+    return versioned_json("exports", user_id, _read_version(user_id, "exports_version"), build)
 
+# --------------------------------------------------------------------------- #
+# Admin                                                                       #
+# --------------------------------------------------------------------------- #
+@bp.route("/admin/maintenance", methods=["GET"])
+@jwt_required()
+def maintenance_status():
+    """Stats from the last background maintenance run (see app/maintenance.py)."""
+    if not _current_admin():
+        return _json_error("Admin only.", 403)
+    return jsonify(maintenance.read_stats() or {"message": "No maintenance run yet."}), 200
 
+@bp.route("/admin/outbound", methods=["GET"])
+@jwt_required()
+def outbound_status():
+    """Circuit breaker, timeout and retry budget state per provider (this worker only)."""
+    if not _current_admin():
+        return _json_error("Admin only.", 403)
+    return jsonify(outbound.states()), 200
 
+@bp.route("/admin/export-cache", methods=["GET"])
+@jwt_required()
+def export_cache_status():
+    """Hit / miss / eviction counters and size of the shared export file cache."""
+    if not _current_admin():
+        return _json_error("Admin only.", 403)
+    return jsonify(filecache.stats()), 200
 
+@bp.route("/admin/usage", methods=["GET"])
+@jwt_required()
+@read_only
+def usage_report():
+    """
+    Daily usage from the rollup tables (app/usage.py).
+    Query: from / to (YYYY-MM-DD, UTC, inclusive; default the last 30 days), user_id (default all users).
+    """
+    if not _current_admin():
+        return _json_error("Admin only.", 403)
 
+    today = datetime.utcnow().date()
+    try:
+        end = datetime.strptime(request.args["to"], "%Y-%m-%d").date() if request.args.get("to") else today
+        start = (
+            datetime.strptime(request.args["from"], "%Y-%m-%d").date()
+            if request.args.get("from") else end - timedelta(days=29)
+        )
+    except ValueError:
+        return _json_error("Dates must be YYYY-MM-DD.", 400)
+    if start > end:
+        return _json_error("'from' must not be after 'to'.", 400)
 
+    user_id = request.args.get("user_id")
+    if user_id is not None:
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            return _json_error("user_id must be an integer.", 400)
 
+    return jsonify(usage.report(db.session, start, end, user_id)), 200
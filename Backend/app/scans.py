@@ -0,0 +1,195 @@
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+
+from .models import db, Scan
+
+# Rows per INSERT statement; keeps SQLite under its bound-parameter limit.
+_INSERT_CHUNK = 500
+# Cap on per-line errors echoed back to the client.
+_MAX_REPORTED_ERRORS = 50
+
+
+def _parse_scanned_at(value) -> datetime:
+    """Accept epoch milliseconds (as stored on the device) or an ISO-8601 string."""
+    if isinstance(value, bool):
+        raise ValueError("invalid scannedAt")
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000, tz=timezone.utc).replace(tzinfo=None)
+    if isinstance(value, str) and value:
+        dt = datetime.fromisoformat(value)
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        return dt
+    raise ValueError("scannedAt required")
+
+
+def _to_record(user_id: int, item) -> dict:
+    if not isinstance(item, dict):
+        raise ValueError("scan must be an object")
+
+    scan_id = str(item.get("id") or "").strip()
+    form_id = str(item.get("formId") or item.get("form_id") or "").strip()
+    key = str(item.get("key") or "").strip()
+    if not scan_id or len(scan_id) > 64:
+        raise ValueError("id must be 1-64 chars")
+    if not form_id or len(form_id) > 64:
+        raise ValueError("formId must be 1-64 chars")
+    if not key or len(key) > 255:
+        raise ValueError("key must be 1-255 chars")
+
+    data = item.get("data")
+    if isinstance(data, str):
+        if not isinstance(json.loads(data), dict):
+            raise ValueError("data must be a JSON object")
+    elif isinstance(data, dict):
+        data = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    else:
+        raise ValueError("data must be a JSON object")
+
+    return {
+        "user_id": user_id,
+        "scan_id": scan_id,
+        "form_id": form_id,
+        "key": key,
+        "data": data,
+        "scanned_at": _parse_scanned_at(item.get("scannedAt", item.get("scanned_at"))),
+    }
+
+
+def _iter_items(body: bytes, ndjson: bool):
+    """Yield (position, item-or-exception) from an NDJSON or JSON batch body."""
+    if ndjson:
+        for lineno, line in enumerate(body.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                yield lineno, json.loads(line)
+            except ValueError as e:
+                yield lineno, e
+        return
+
+    payload = json.loads(body or b"null")
+    items = payload.get("scans") if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        raise ValueError("Body must be a list of scans or {\"scans\": [...]}.")
+    yield from enumerate(items)
+
+
+def parse_sync_body(user_id: int, body: bytes, ndjson: bool, max_scans: int):
+    """
+    Validate a sync batch. Returns (records, rejected, received) where
+    rejected is a compact list of {"at": line/index, "id": ..., "error": ...}.
+    Later items with the same id replace earlier ones.
+    """
+    records = {}
+    rejected = []
+    received = 0
+    for at, item in _iter_items(body, ndjson):
+        received += 1
+        if received > max_scans:
+            raise ValueError(f"Too many scans (>{max_scans}).")
+        try:
+            if isinstance(item, Exception):
+                raise ValueError("invalid JSON")
+            record = _to_record(user_id, item)
+        except (ValueError, TypeError, OverflowError, OSError) as e:
+            if len(rejected) < _MAX_REPORTED_ERRORS:
+                rejected.append({
+                    "at": at,
+                    "id": item.get("id") if isinstance(item, dict) else None,
+                    "error": str(e) or "invalid scan",
+                })
+            continue
+        records[record["scan_id"]] = record
+    return list(records.values()), rejected, received
+
+
+def _dialect_insert():
+    name = db.session.get_bind().dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+def upsert_scans(records: list) -> None:
+    """
+    Bulk insert scans; on (user_id, scan_id) conflict take the incoming values
+    if the stored scan has not been exported and is not newer. Runs inside the
+    caller's transaction.
+    """
+    dialect_insert = _dialect_insert()
+    if dialect_insert is None:
+        _insert_new_only(records)
+        return
+
+    stmt = dialect_insert(Scan)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "scan_id"],
+        set_={
+            "form_id": stmt.excluded.form_id,
+            "key": stmt.excluded.key,
+            "data": stmt.excluded.data,
+            "scanned_at": stmt.excluded.scanned_at,
+        },
+        where=(Scan.export_id.is_(None)) & (Scan.scanned_at <= stmt.excluded.scanned_at),
+    )
+    for i in range(0, len(records), _INSERT_CHUNK):
+        db.session.execute(stmt, records[i:i + _INSERT_CHUNK])
+
+
+def _insert_new_only(records: list) -> None:
+    """Portable fallback for databases without ON CONFLICT: skip ids already stored."""
+    for i in range(0, len(records), _INSERT_CHUNK):
+        chunk = records[i:i + _INSERT_CHUNK]
+        user_id = chunk[0]["user_id"]
+        known = {
+            sid for (sid,) in db.session.query(Scan.scan_id).filter(
+                Scan.user_id == user_id, Scan.scan_id.in_([r["scan_id"] for r in chunk])
+            )
+        }
+        fresh = [r for r in chunk if r["scan_id"] not in known]
+        if fresh:
+            db.session.execute(insert(Scan), fresh)
+
+
+def claim_pending_scans(user_id: int, form_id: str, limit: int, export_id: str):
+    """
+    Claim up to `limit` of the oldest unexported scans for a form for
+    export_id and commit the claim. Returns ({scan id: scan pk}, export rows)
+    for the scans this call won: the UPDATE only takes scans that are still
+    unclaimed, so concurrent exports never get the same scan.
+    """
+    candidates = [
+        pk
+        for (pk,) in db.session.query(Scan.id)
+        .filter_by(user_id=user_id, form_id=form_id, export_id=None)
+        .order_by(Scan.scanned_at.asc(), Scan.id.asc())
+        .limit(limit)
+    ]
+    for i in range(0, len(candidates), _INSERT_CHUNK):
+        Scan.query.filter(Scan.id.in_(candidates[i:i + _INSERT_CHUNK]), Scan.export_id.is_(None)).update(
+            {"export_id": export_id}, synchronize_session=False
+        )
+    db.session.commit()
+
+    scans = []
+    for i in range(0, len(candidates), _INSERT_CHUNK):
+        scans.extend(
+            Scan.query.filter(Scan.id.in_(candidates[i:i + _INSERT_CHUNK]), Scan.export_id == export_id)
+        )
+    scans.sort(key=lambda s: (s.scanned_at, s.id))
+    return {s.scan_id: s.id for s in scans}, [s.as_export_row() for s in scans]
+
+
+def release_scans(scan_pks: list, export_id: str) -> None:
+    """Make scans claimed for export_id pending again (not committed here)."""
+    for i in range(0, len(scan_pks), _INSERT_CHUNK):
+        Scan.query.filter(Scan.id.in_(scan_pks[i:i + _INSERT_CHUNK]), Scan.export_id == export_id).update(
+            {"export_id": None}, synchronize_session=False
+        )
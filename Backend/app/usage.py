@@ -0,0 +1,90 @@
+"""
+Per-user / per-day usage rollups (usage_user_days, usage_days).
+
+Every token charge or refund, export and export email adds to two counter
+rows for today (UTC): the user's row and one of USAGE_SHARDS all-users rows
+(picked by user_id, so concurrent charges of different users rarely wait on
+the same row). That is one upsert each, in the same transaction as the
+change it counts, so the rollups commit or roll back with it. Reports then
+read a few rows per day instead of scanning exports, and tokensUsed (a
+running total) gets a history.
+
+History starts when the tables are created; older exports are not backfilled.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .models import UsageDay, UsageUserDay
+
+COUNTERS = ("tokens_charged", "tokens_refunded", "exports", "rows", "emails_sent", "emails_failed")
+USAGE_SHARDS = 16
+
+_UPSERT = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _upsert(conn, model, keys: dict, counts: dict):
+    table = model.__table__
+    dialect = conn.dialect.name if hasattr(conn, "dialect") else conn.get_bind().dialect.name
+    make_insert = _UPSERT.get(dialect)
+    if make_insert is not None:
+        stmt = make_insert(table).values(**keys, **counts)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={c: table.c[c] + stmt.excluded[c] for c in counts},
+        )
+        conn.execute(stmt)
+        return
+    # Other databases: update, insert if there was nothing to update.
+    where = [table.c[k] == v for k, v in keys.items()]
+    result = conn.execute(update(table).where(*where).values({c: table.c[c] + n for c, n in counts.items()}))
+    if result.rowcount == 0:
+        conn.execute(insert(table).values(**keys, **counts))
+
+
+def record(conn, user_id: int, **counts):
+    """
+    Add counts (see COUNTERS) to today's rows for user_id and for all users.
+
+    conn is the Connection or Session doing the work being counted; nothing
+    is committed here.
+    """
+    counts = {name: int(n) for name, n in counts.items() if n}
+    unknown = set(counts) - set(COUNTERS)
+    if unknown:
+        raise ValueError(f"Unknown usage counters: {sorted(unknown)}")
+    if not counts:
+        return
+    day = datetime.utcnow().date()
+    _upsert(conn, UsageUserDay, {"user_id": user_id, "day": day}, counts)
+    _upsert(conn, UsageDay, {"day": day, "shard": user_id % USAGE_SHARDS}, counts)
+
+
+def report(session, start: date, end: date, user_id=None) -> dict:
+    """Daily counters and totals for start..end inclusive, for one user or everyone."""
+    if user_id is not None:
+        model = UsageUserDay
+        columns = [getattr(model, c) for c in COUNTERS]
+        query = select(model.day, *columns).where(model.user_id == user_id)
+    else:
+        model = UsageDay
+        columns = [func.sum(getattr(model, c)) for c in COUNTERS]
+        query = select(model.day, *columns).group_by(model.day)
+    query = query.where(model.day >= start, model.day <= end)
+
+    days = [
+        {"day": row[0].isoformat(), **dict(zip(COUNTERS, row[1:]))}
+        for row in session.execute(query.order_by(model.day))
+    ]
+    totals = dict.fromkeys(COUNTERS, 0)
+    for d in days:
+        for c in COUNTERS:
+            totals[c] += d[c]
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "user_id": user_id,
+        "days": days,
+        "totals": totals,
+    }
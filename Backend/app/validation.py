@@ -0,0 +1,131 @@
+"""
+Server-side row validation from forms.json field specs, mirroring the app's
+zod schema (utils/zodSchemaBuilder.js). Each form is compiled once into a
+FormValidator and rebuilt when forms.json changes.
+"""
+import threading
+
+from .wire import Columns
+
+_validators = {}  # form id -> (form dict it was compiled from, FormValidator)
+_validators_lock = threading.Lock()
+
+
+class FormValidator:
+    def __init__(self, form: dict):
+        checks = []
+        for field in form.get("fields") or []:
+            field_id = field.get("id")
+            if not field_id:
+                continue
+            required = bool(field.get("required"))
+            min_length = field.get("minLength")
+            max_length = field.get("maxLength")
+            min_length = min_length if isinstance(min_length, int) else 0
+            max_length = max_length if isinstance(max_length, int) else None
+            if required or min_length or max_length is not None:
+                checks.append((field_id, min_length, max_length, required))
+        self.checks = tuple(checks)
+
+    def _row_errors(self, row: dict) -> dict:
+        errors = {}
+        for field_id, min_length, max_length, required in self.checks:
+            value = row.get(field_id)
+            if value is None:
+                if required:
+                    errors[field_id] = "required"
+                continue
+            length = len(str(value).strip())
+            if required and not length:
+                errors[field_id] = "required"
+            elif length < min_length:
+                errors[field_id] = "too_short"
+            elif max_length is not None and length > max_length:
+                errors[field_id] = "too_long"
+        return errors
+
+    def validate(self, rows: list, max_errors: int = 20, malformed=None):
+        """
+        Split rows into (valid rows, summary). summary is None when every row
+        passed, else {"invalid": count, "rows": [{"id", "errors": {field: code}}]}
+        listing at most max_errors rows; codes are required / too_short / too_long.
+        malformed: entries for rows already dropped by parse_rows, reported first.
+        """
+        malformed = malformed or []
+        invalid = len(malformed)
+        reported = malformed[:max_errors]
+        if not self.checks:
+            return rows, _summary(invalid, reported)
+
+        if isinstance(rows, Columns):
+            return self._validate_columns(rows, max_errors, invalid, reported)
+
+        valid = []
+        for row in rows:
+            errors = self._row_errors(row)
+            if not errors:
+                valid.append(row)
+                continue
+            invalid += 1
+            if len(reported) < max_errors:
+                reported.append({"id": row.get("id"), "errors": errors})
+
+        return valid, _summary(invalid, reported)
+
+
+    def _failing(self, rows: Columns) -> set:
+        """Positions of rows failing any check, read column by column."""
+        failing = set()
+        for field_id, min_length, max_length, required in self.checks:
+            col = rows.column(field_id)
+            if col is None:
+                if required:
+                    return set(range(len(rows)))
+                continue
+            low = max(min_length, 1 if required else 0)
+            high = max_length if max_length is not None else float("inf")
+            failing.update(
+                i for i, value in enumerate(col)
+                if (required if value is None else not low <= len(str(value).strip()) <= high)
+            )
+        return failing
+
+    def _validate_columns(self, rows: Columns, max_errors: int, invalid: int, reported: list):
+        failing = self._failing(rows)
+        if not failing:
+            return rows, _summary(invalid, reported)
+        for i in sorted(failing):
+            invalid += 1
+            if len(reported) < max_errors:
+                row = rows.row(i)
+                reported.append({"id": row.get("id"), "errors": self._row_errors(row)})
+        return rows.take([i for i in range(len(rows)) if i not in failing]), _summary(invalid, reported)
+
+
+def _summary(invalid: int, reported: list):
+    return {"invalid": invalid, "rows": reported} if invalid else None
+
+
+_NO_CHECKS = FormValidator({})
+
+
+def form_validator(form):
+    """The compiled FormValidator for a form definition (None for no form), reused across requests."""
+    if not form:
+        return None
+    form_id = form.get("id")
+    cached = _validators.get(form_id)
+    if cached is not None and cached[0] is form:
+        return cached[1]
+    with _validators_lock:
+        cached = _validators.get(form_id)
+        if cached is None or cached[0] is not form:
+            cached = (form, FormValidator(form))
+            _validators[form_id] = cached
+        return cached[1]
+
+
+def validate_rows(rows: list, form, malformed=None, max_errors: int = 20):
+    """validate() with the form's compiled validator; with no form only malformed rows are reported."""
+    validator = form_validator(form) or _NO_CHECKS
+    return validator.validate(rows, max_errors, malformed=malformed)
@@ -0,0 +1,71 @@
+"""
+Measure what Content-Encoding saves on a synthetic export upload: body size,
+client compression time, server decode time (app.compression.read_body) and
+estimated upload time on slow links.
+
+    python benchmarks/bench_compression.py --rows 50000 --mbps 1 5 20
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+
+from app.compression import read_body, zstandard  # noqa: E402
+
+
+def make_body(n: int) -> bytes:
+    rows = [
+        {
+            "id": f"{i:032x}",
+            "form_id": "location",
+            "key": f"1Z999AA1{i:010d}",
+            "scanned_at": f"2025-01-01T08:{i // 60 % 60:02d}:{i % 60:02d}.000Z",
+            "data": json.dumps({"parcelBarcode": f"1Z999AA1{i:010d}", "parcelLocation": f"A-{i % 40:02d}-{i % 7}"}),
+        }
+        for i in range(n)
+    ]
+    return json.dumps({"exportId": "bench", "formId": "location", "rows": rows}).encode()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--mbps", type=float, nargs="+", default=[1.0, 5.0, 20.0])
+    args = parser.parse_args()
+
+    raw = make_body(args.rows)
+    encodings = [("identity", lambda b: b), ("gzip", lambda b: gzip.compress(b, compresslevel=6))]
+    if zstandard is not None:
+        encodings.append(("zstd", lambda b: zstandard.ZstdCompressor(level=3).compress(b)))
+
+    app = Flask(__name__)
+    limit = len(raw) + 1
+
+    links = "".join(f" {f'upload@{m:g}Mbps s':>19}" for m in args.mbps)
+    print(f"{args.rows} rows, {len(raw):,} bytes uncompressed")
+    print(f"{'encoding':>9} {'bytes':>12} {'ratio':>6} {'client ms':>10} {'server ms':>10}{links}")
+    for name, compress in encodings:
+        body, client_s = timed(lambda: compress(raw))
+        with app.test_request_context("/", method="POST", data=body,
+                                      headers={"Content-Encoding": name}):
+            decoded, server_s = timed(lambda: read_body(limit, limit))
+        assert decoded == raw
+        uploads = "".join(f" {len(body) * 8 / (m * 1_000_000):>19.2f}" for m in args.mbps)
+        print(f"{name:>9} {len(body):>12,} {len(raw) / len(body):>6.1f} "
+              f"{client_s * 1000:>10.1f} {server_s * 1000:>10.1f}{uploads}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Time server-side duplicate handling (app.exports.apply_duplicate_rules) on
+synthetic location-form rows.
+
+    python benchmarks/bench_duplicates.py --rows 10000 100000 500000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.exports import apply_duplicate_rules  # noqa: E402
+
+LOCATION_FORM = {
+    "id": "location",
+    "handleDuplicateKey": "update",
+    "handleIdenticalFields": "error",
+    "fields": [{"id": "parcelBarcode"}, {"id": "parcelLocation"}],
+}
+
+
+def make_rows(n: int, dup_ratio: float):
+    rng = random.Random(42)
+    distinct = max(1, int(n * (1 - dup_ratio)))
+    return [
+        {
+            "id": f"s{i}",
+            "form_id": "location",
+            "scanned_at": f"2025-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}Z",
+            "parcelBarcode": f"P{rng.randrange(distinct):08d}",
+            "parcelLocation": f"L{rng.randrange(500):04d}",
+        }
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--dup-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'mode':>7} {'seconds':>9} {'rows/s':>12} {'duplicates':>11}")
+    for n in args.rows:
+        rows = make_rows(n, args.dup_ratio)
+        for mode in ("error", "update"):
+            form = {**LOCATION_FORM, "handleDuplicateKey": mode}
+            start = time.perf_counter()
+            _, summary = apply_duplicate_rules(rows, form)
+            elapsed = time.perf_counter() - start
+            print(f"{n:>10} {mode:>7} {elapsed:>9.3f} {n / elapsed:>12,.0f} {summary['duplicates']:>11}")
+
+
+if __name__ == "__main__":
+    main()
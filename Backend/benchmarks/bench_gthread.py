@@ -0,0 +1,180 @@
+"""
+Concurrency of routes that wait on an outbound API: gunicorn sync workers vs
+gthread workers (gunicorn -k gthread --threads N).
+
+A local fake Resend API answers every call after --delay seconds. Both
+servers run against the same seeded SQLite file and receive --requests
+POST /api/exports/resend/<id> calls, --concurrency at a time. Each call
+sends one email through the fake API.
+
+    python benchmarks/bench_gthread.py --delay 0.3 --requests 200 --concurrency 50
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+import requests  # noqa: E402
+
+EXPORT_ID = "bench-gthread"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_fake_api(delay: float) -> ThreadingHTTPServer:
+    class SlowHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(delay)
+            body = json.dumps({"id": "fake"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", free_port()), SlowHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def seed(env: dict) -> str:
+    """Create the schema, a user with an active email and one export; return a JWT."""
+    os.environ.update(env)
+    from flask_jwt_extended import create_access_token
+    from app import create_app, db
+    from app.models import Email, Export, User
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(username="bench", password_hash="x", tokensTotal=10**9)
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Email(user_id=user.id, email="bench@scan.test", is_active=True))
+        db.session.add(Export(export_id=EXPORT_ID, user_id=user.id, minimal_csv=f"{EXPORT_ID}_minimal.csv",
+                              full_csv=f"{EXPORT_ID}_full.csv", payload_json=f"{EXPORT_ID}.json"))
+        db.session.commit()
+        token = create_access_token(identity=str(user.id))
+
+    folder = os.path.join(app.instance_path, "savedExports")
+    os.makedirs(folder, exist_ok=True)
+    for suffix in ("minimal", "full"):
+        with open(os.path.join(folder, f"{EXPORT_ID}_{suffix}.csv"), "w") as f:
+            f.write("parcelBarcode\n" + "".join(f"P{i}\n" for i in range(200)))
+    return token
+
+
+def start_server(port: int, workers: int, threads: int, env: dict) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}",
+           "--log-level", "warning", "app:create_app()"]
+    if threads > 1:
+        cmd[3:3] = ["-k", "gthread", "--threads", str(threads)]
+        # each thread may hold two DB connections (its session plus the atomic token charge)
+        env = {**env, "DB_POOL_SIZE": str(2 * threads)}
+    proc = subprocess.Popen(cmd, cwd=BACKEND, env={**os.environ, **env},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/health", timeout=2).status_code == 200:
+                return proc
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"gunicorn ({' '.join(cmd[3:])}) did not start")
+
+
+def drive(port: int, token: str, total: int, concurrency: int):
+    latencies, statuses = [], {}
+    local = threading.local()
+    url = f"http://127.0.0.1:{port}/api/exports/resend/{EXPORT_ID}"
+
+    def one(_):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()  # one keep-alive connection per client thread
+        start = time.perf_counter()
+        response = session.post(url, headers={"Authorization": f"Bearer {token}"}, timeout=120)
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        list(clients.map(one, range(total)))
+    return time.perf_counter() - start, latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=0.3, help="fake API latency (s)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers (both setups)")
+    parser.add_argument("--threads", type=int, default=16, help="threads per gthread worker")
+    args = parser.parse_args()
+
+    fake = start_fake_api(args.delay)
+    tmp = tempfile.mkdtemp()
+    env = {
+        "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+        "SECRET_KEY": "bench",
+        "JWT_SECRET_KEY": "bench-jwt-secret-key-0123456789abcdef",
+        "RESEND_API_KEY": "re_bench",
+        "RESEND_API_URL": f"http://127.0.0.1:{fake.server_address[1]}",
+        "RATELIMIT_ENABLED": "0",
+        "MAINTENANCE_ENABLED": "0",
+        "LOG_ACCESS": "0",
+    }
+    token = seed(env)
+
+    print(f"fake API delay {args.delay * 1000:.0f} ms, {args.requests} requests, concurrency {args.concurrency}")
+    print(f"{'server':<28} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}  status")
+    setups = [
+        (1, f"sync -w {args.workers}"),
+        (args.threads, f"gthread -w {args.workers} --threads {args.threads}"),
+    ]
+    try:
+        for threads, label in setups:
+            port = free_port()
+            proc = start_server(port, args.workers, threads, env)
+            try:
+                elapsed, latencies, statuses = drive(port, token, args.requests, args.concurrency)
+            finally:
+                proc.terminate()
+                proc.wait()
+            q = statistics.quantiles(latencies, n=100)
+            print(f"{label:<28} {args.requests / elapsed:>8.1f} {q[49] * 1000:>8.0f} {q[94] * 1000:>8.0f} "
+                  f"{max(latencies) * 1000:>8.0f}  {statuses}")
+    finally:
+        fake.shutdown()
+        shutil.rmtree(tmp, ignore_errors=True)
+        for suffix in ("minimal", "full"):
+            try:
+                os.remove(os.path.join(BACKEND, "instance", "savedExports", f"{EXPORT_ID}_{suffix}.csv"))
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Outbound client behaviour (app/outbound.py) against local stand-in servers.
+
+For each scenario the Resend and Stripe SDKs are pointed at a local server.
+That server answers normally, hangs past the read timeout, returns 503, or
+is not listening at all. The script then makes --calls sequential calls and
+reports latency, errors and the circuit breaker state afterwards. With the
+breaker open, calls should fail in well under a millisecond instead of
+waiting out a timeout.
+
+    python benchmarks/bench_outbound.py --calls 20 --read-timeout 0.5
+
+The same behaviour is asserted in tests/test_outbound.py (python -m pytest tests).
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-jwt-secret-key-0123456789abcdef")
+os.environ.setdefault("RESEND_API_KEY", "re_bench")
+os.environ.setdefault("STRIPE_API_KEY", "sk_test_bench")
+os.environ["MAINTENANCE_ENABLED"] = "0"
+
+import resend  # noqa: E402
+import stripe  # noqa: E402
+
+MODE = {"value": "ok"}
+
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+    wbufsize = 64 * 1024  # one write per response (avoids Nagle stalls on keep-alive)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        mode = MODE["value"]
+        if mode == "hang":
+            time.sleep(30)
+            return
+        if mode == "fail":
+            self._reply(503, {"error": {"message": "unavailable"}})
+        elif self.path.startswith("/v1/checkout"):
+            self._reply(200, {"id": "cs_test", "object": "checkout.session", "url": "https://pay.test/cs"})
+        else:
+            self._reply(200, {"id": "email_test"})
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def send_email():
+    resend.Emails.send({"from": "a@scan.test", "to": "b@scan.test", "subject": "s", "html": "h"})
+
+
+def create_checkout():
+    stripe.checkout.Session.create(mode="payment", line_items=[], success_url="https://x", cancel_url="https://x")
+
+
+def run(label, call, calls, provider):
+    from app import outbound
+
+    latencies, errors = [], 0
+    for _ in range(calls):
+        start = time.perf_counter()
+        try:
+            call()
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    state = outbound.states()[provider]
+    first = latencies[0] * 1000
+    last = statistics.median(latencies[-5:]) * 1000
+    print(f"{label:<22} {errors:>4}/{calls:<4} {first:>9.1f} {last:>11.2f} {max(latencies) * 1000:>8.0f}  "
+          f"{state['state']:<9} rejected={state['rejected']} opened={state['opened']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--read-timeout", type=float, default=0.5)
+    args = parser.parse_args()
+
+    for prefix in ("RESEND", "STRIPE"):
+        os.environ[f"{prefix}_READ_TIMEOUT"] = str(args.read_timeout)
+        os.environ[f"{prefix}_CONNECT_TIMEOUT"] = "0.5"
+    os.environ["BREAKER_RESET_SECONDS"] = "3600"
+
+    server = ThreadingHTTPServer(("127.0.0.1", free_port()), StandIn)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    live = f"http://127.0.0.1:{server.server_address[1]}"
+    dead = f"http://127.0.0.1:{free_port()}"  # nothing listens here
+
+    from app import create_app
+    print(f"{'scenario':<22} {'errors':>9} {'first ms':>9} {'last-5 p50':>11} {'max ms':>8}  breaker")
+    for mode, base in (("ok", live), ("hang", live), ("fail", live), ("down", dead)):
+        create_app()  # fresh clients and breakers per scenario
+        MODE["value"] = mode
+        resend.api_url = base
+        stripe.api_base = base
+        run(f"resend {mode}", send_email, args.calls, "resend")
+        run(f"stripe {mode}", create_checkout, args.calls, "stripe")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Render the minimal + full CSVs of one large export serially and on 1..N
+worker processes (app.exports.write_csv_parallel), and check that the
+output is byte-identical.
+
+    python benchmarks/bench_parallel_render.py --rows 5000 --max-processes 4
+"""
+import argparse
+import filecmp
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import exports  # noqa: E402
+from app.exports import write_csv, write_csv_parallel  # noqa: E402
+
+
+def make_rows(n: int):
+    rng = random.Random(42)
+    return [
+        {
+            "id": f"s{i}",
+            "form_id": "location",
+            "scanned_at": f"2025-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}Z",
+            "parcelBarcode": f"P{rng.randrange(10 ** 9):010d}",
+            # some values need quoting or the CSV-injection prefix
+            "parcelLocation": rng.choice(["L0001", "=SUM(A1)", "Dock 4, bay \"B\"", "-12"]),
+            "note": rng.choice(["", "damaged", "re-scan", "line1\nline2"]),
+        }
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    full = sorted(rows[0])
+    minimal = ["parcelBarcode", "parcelLocation"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ref = [(os.path.join(tmp, "ref_minimal.csv"), minimal), (os.path.join(tmp, "ref_full.csv"), full)]
+        start = time.perf_counter()
+        for path, fieldnames in ref:
+            write_csv(path, fieldnames, rows)
+        serial = time.perf_counter() - start
+
+        print(f"{args.rows:,} rows, {os.cpu_count()} CPU(s) visible")
+        print(f"{'mode':<14} {'ms':>8} {'speedup':>8}  identical")
+        print(f"{'serial':<14} {serial * 1000:>8.1f} {1.0:>8.2f}  -")
+
+        for processes in range(1, args.max_processes + 1):
+            if exports._process_pool is not None:  # fresh pool per size
+                exports._process_pool.shutdown()
+                exports._process_pool = None
+            exports.process_pool(processes).submit(int).result()  # start workers outside the timing
+
+            outputs = [(os.path.join(tmp, f"p{processes}_minimal.csv"), minimal),
+                       (os.path.join(tmp, f"p{processes}_full.csv"), full)]
+            start = time.perf_counter()
+            write_csv_parallel(outputs, rows, processes)
+            elapsed = time.perf_counter() - start
+            same = all(filecmp.cmp(a, b, shallow=False) for (a, _), (b, _) in zip(ref, outputs))
+            print(f"{f'{processes} process(es)':<14} {elapsed * 1000:>8.1f} {serial / elapsed:>8.2f}  {same}")
+            for path, _ in outputs:
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Time every query routes.py runs against users / emails / exports /
+processed_events (and friends) at several data scales.
+
+For each scale a fresh SQLite file is seeded with benchmarks/seed_data.py.
+Each query is built the same way the route builds it (same ORM calls) and run
+--iterations times with random keys that exist. The p50/p95 latency and the
+SQLite query plan are printed, so a plan that turns into a SCAN as tables
+grow stands out.
+
+    python benchmarks/bench_queries.py --scales 10000,100000,1000000
+    python benchmarks/bench_queries.py --scales 100000 --database-url postgresql://scan@localhost/scan_bench
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from seed_data import NOW, create_schema, seed  # noqa: E402
+
+
+def queries(n_users: int, n_exports: int):
+    """(name, route, fn) triples; fn runs the route's query once with random keys."""
+    from sqlalchemy import text
+    from app.models import db, Email, Export, ExportRow, PasswordResetToken, ProcessedEvent, User
+
+    def uid():
+        return random.randint(1, n_users)
+
+    def export_id():
+        return str(1_700_000_000_000 + random.randint(1, n_exports) * 37)
+
+    def charge():
+        # _charge_tokens, rolled back so token balances stay put
+        with db.engine.connect() as conn:
+            conn.execute(
+                text("UPDATE users SET tokensUsed = tokensUsed + :cost "
+                     "WHERE id = :uid AND (tokensTotal - tokensUsed) >= :cost"),
+                {"cost": 0, "uid": uid()},
+            )
+            conn.rollback()
+
+    def purge_candidates():
+        # maintenance._purge_in_batches inner SELECT
+        cutoff = (NOW - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S.%f")
+        db.session.execute(
+            text("SELECT id FROM processed_events WHERE created_at < :cutoff LIMIT 500"), {"cutoff": cutoff}
+        ).fetchall()
+
+    return [
+        ("user by id", "jwt identity (every route)", lambda: db.session.get(User, uid())),
+        ("user by username", "login / register / reset", lambda: User.query.filter_by(
+            username=f"user{uid():07d}").first()),
+        ("email by address", "reset-password/request", lambda: Email.query.filter_by(
+            email=f"user{uid():07d}.0@scan.test").first()),
+        ("active email", "export / resend / tokens", lambda: Email.query.filter_by(
+            user_id=uid(), is_active=True).first()),
+        ("list emails", "GET /emails", lambda: Email.query.filter_by(
+            user_id=uid()).order_by(Email.id.asc()).all()),
+        ("list exports", "GET /exports", lambda: db.session.query(Export.export_id).filter_by(
+            user_id=uid()).order_by(Export.created_at.desc()).all()),
+        ("export by id+owner", "resend / download / delta", lambda: Export.query.filter_by(
+            export_id=export_id(), user_id=uid()).first()),
+        ("version counter", "ETag check on GETs", lambda: db.session.query(User.exports_version).filter_by(
+            id=uid()).scalar()),
+        ("charge tokens", "_charge_tokens", charge),
+        ("processed event", "stripe webhook", lambda: ProcessedEvent.query.filter_by(
+            event_id=f"evt_{random.randint(1, n_exports):024x}").first()),
+        ("reset token", "reset-password/confirm", lambda: PasswordResetToken.query.filter_by(
+            token_hash=f"{random.getrandbits(256):064x}").first()),
+        ("barcode lookup", "GET /scans/lookup", lambda: db.session.query(ExportRow.row_no).filter(
+            ExportRow.user_id == uid(), ExportRow.barcode == f"PCL{random.randint(0, 10 ** 9):010d}").all()),
+        ("purge batch", "maintenance", purge_candidates),
+    ]
+
+
+def sqlite_plan(fn) -> str:
+    """Capture the statement fn runs and return SQLite's plan for it, abbreviated."""
+    from sqlalchemy import event
+    from app.models import db
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+    statement, parameters = captured[-1]
+    raw = db.engine.raw_connection()
+    try:
+        rows = raw.execute(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    finally:
+        raw.close()
+    return "; ".join(row[-1].replace("USING ", "").replace("INDEX ", "") for row in rows)[:70]
+
+
+def time_query(fn, iterations: int):
+    fn()  # warm the page cache and statement cache
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    q = statistics.quantiles(samples, n=20)
+    return q[9] * 1e6, q[18] * 1e6
+
+
+def run_scale(scale: int, database_url: str, iterations: int, rows_per_export: int):
+    from app import db
+
+    app = create_schema(database_url, drop=True)
+    with app.app_context():
+        start = time.perf_counter()
+        seed(db.engine, scale, rows_per_export)
+        seeded = time.perf_counter() - start
+        sqlite = db.engine.dialect.name == "sqlite"
+
+        print(f"\n== scale {scale:,} exports ({max(1, scale // 10):,} users), seeded in {seeded:.1f}s ==")
+        print(f"{'query':<20} {'route':<28} {'p50 us':>9} {'p95 us':>9}  {'plan' if sqlite else ''}")
+        for name, route, fn in queries(max(1, scale // 10), scale):
+            p50, p95 = time_query(fn, iterations)
+            plan = sqlite_plan(fn) if sqlite else ""
+            print(f"{name:<20} {route:<28} {p50:>9.0f} {p95:>9.0f}  {plan}")
+            db.session.rollback()
+        db.session.remove()
+        db.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="10000,100000", help="comma-separated export counts")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--rows-per-export", type=int, default=2)
+    parser.add_argument("--database-url", help="use this database (tables are dropped!) instead of temp SQLite files")
+    args = parser.parse_args()
+
+    random.seed(7)
+    for scale in (int(s) for s in args.scales.split(",")):
+        if args.database_url:
+            run_scale(scale, args.database_url, args.iterations, args.rows_per_export)
+            continue
+        with tempfile.TemporaryDirectory() as tmp:
+            run_scale(scale, f"sqlite:///{os.path.join(tmp, 'bench.db')}", args.iterations, args.rows_per_export)
+
+
+if __name__ == "__main__":
+    main()
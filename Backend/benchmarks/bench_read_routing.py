@@ -0,0 +1,129 @@
+"""
+Read latency of the polled listing endpoints during an export write storm,
+with and without read/write routing (app/db_routing.py).
+
+  before: one engine, SQLite rollback journal (DB_READ_ROUTING=0, SQLITE_WAL=0)
+  after:  WAL + a separate read-only engine for @read_only routes
+
+Each mode gets a fresh SQLite file. Writer threads commit export-sized
+transactions (insert export_rows, bump the user's exports version) while
+reader threads poll GET /api/exports and GET /api/getUserTokens.
+
+    python benchmarks/bench_read_routing.py --seconds 10 --writers 2 --readers 2
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-jwt-secret-key-0123456789abcdef")
+os.environ["MAINTENANCE_ENABLED"] = "0"
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy import insert, text  # noqa: E402
+
+MODES = {
+    "before": {"DB_READ_ROUTING": "0", "SQLITE_WAL": "0"},
+    "after": {"DB_READ_ROUTING": "1", "SQLITE_WAL": "1"},
+}
+
+
+def build_app(db_path: str, env: dict):
+    os.environ.update(env)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from app import create_app, db, limiter
+    from app.models import Export, User
+
+    app = create_app()
+    app.config["RATELIMIT_ENABLED"] = False
+    limiter.enabled = False
+    with app.app_context():
+        db.create_all()
+        user = User(username="bench", password_hash="x", tokensTotal=10**9)
+        db.session.add(user)
+        db.session.flush()
+        db.session.execute(insert(Export), [
+            {"export_id": f"e{i}", "user_id": user.id, "minimal_csv": "m", "full_csv": "f",
+             "payload_json": "p", "row_count": 1000}
+            for i in range(500)
+        ])
+        db.session.commit()
+        token = create_access_token(identity=str(user.id))
+    return app, db, user.id, token
+
+
+def writer(app, db, user_id, stop, rows_per_txn, counter):
+    with app.app_context():
+        while not stop.is_set():
+            with db.engine.begin() as conn:
+                conn.execute(
+                    text("INSERT INTO export_rows (export_pk, row_no, row_key) VALUES (1, :n, :k)"),
+                    [{"n": i, "k": f"P{i}"} for i in range(rows_per_txn)],
+                )
+                conn.execute(
+                    text("UPDATE users SET exports_version = exports_version + 1, tokensUsed = tokensUsed + 1 WHERE id = :uid"),
+                    {"uid": user_id},
+                )
+            counter[0] += 1
+
+
+def reader(app, token, stop, latencies):
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+    paths = ("/api/exports", "/api/getUserTokens")
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = client.get(paths[i % 2], headers=headers)
+        elapsed = time.perf_counter() - start
+        if response.status_code == 200:
+            latencies.append(elapsed)
+        i += 1
+
+
+def run(mode: str, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        app, db, user_id, token = build_app(os.path.join(tmp, "bench.db"), MODES[mode])
+        stop = threading.Event()
+        latencies, txns = [], [0]
+        threads = [threading.Thread(target=writer, args=(app, db, user_id, stop, args.rows_per_txn, txns))
+                   for _ in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(app, token, stop, latencies))
+                    for _ in range(args.readers)]
+        for t in threads:
+            t.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        with app.app_context():
+            db.engine.dispose()
+            for engine in db.engines.values():
+                engine.dispose()
+
+    q = statistics.quantiles(latencies, n=100)
+    print(f"{mode:>7} {len(latencies) / args.seconds:>9.0f} {q[49] * 1000:>8.1f} {q[94] * 1000:>8.1f} "
+          f"{q[98] * 1000:>8.1f} {max(latencies) * 1000:>8.1f} {txns[0] / args.seconds:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--rows-per-txn", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'mode':>7} {'reads/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'write tx/s':>11}")
+    for mode in ("before", "after"):
+        run(mode, args)
+
+
+if __name__ == "__main__":
+    main()
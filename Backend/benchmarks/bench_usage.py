@@ -0,0 +1,124 @@
+"""
+GET /api/admin/usage over a year of rollups, and the cost of keeping them.
+
+Fills usage_user_days / usage_days with --days days of activity for --users
+users (each active on --active-share of days), then times app.usage.report()
+for the whole range, for all users and for single users. It also times
+usage.record() on its own, which is the upsert pair each charge, refund or
+export adds.
+
+    python benchmarks/bench_usage.py --users 10000 --days 365
+    python benchmarks/bench_usage.py --database-url postgresql://scan@localhost/scan_bench
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from seed_data import _chunks, create_schema  # noqa: E402
+
+END = date(2025, 6, 1)
+
+
+def fill(engine, users: int, days: int, active_share: float):
+    from sqlalchemy import insert
+    from app.models import User, UsageDay, UsageUserDay
+    from app.usage import COUNTERS, USAGE_SHARDS
+
+    rng = random.Random(42)
+    totals = {}
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": i, "username": f"user{i:07d}", "password_hash": "x"}
+                                    for i in range(1, users + 1)])
+
+        def user_days():
+            for user_id in range(1, users + 1):
+                for d in range(days):
+                    if rng.random() >= active_share:
+                        continue
+                    day = END - timedelta(days=d)
+                    exports = rng.randint(1, 20)
+                    row = {"user_id": user_id, "day": day, "tokens_charged": exports + rng.randint(0, 5),
+                           "tokens_refunded": rng.randint(0, 1), "exports": exports,
+                           "rows": exports * rng.randint(10, 500), "emails_sent": exports,
+                           "emails_failed": rng.randint(0, 1)}
+                    day_total = totals.setdefault((day, user_id % USAGE_SHARDS), dict.fromkeys(COUNTERS, 0))
+                    for c in COUNTERS:
+                        day_total[c] += row[c]
+                    yield row
+
+        count = 0
+        for chunk in _chunks(user_days()):
+            conn.execute(insert(UsageUserDay), chunk)
+            count += len(chunk)
+        conn.execute(insert(UsageDay), [{"day": day, "shard": shard, **t} for (day, shard), t in totals.items()])
+    return count
+
+
+def timed(fn, iterations: int):
+    fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    q = statistics.quantiles(samples, n=20)
+    return q[9] * 1000, q[18] * 1000
+
+
+def run(database_url: str, args):
+    from app import db, usage
+
+    app = create_schema(database_url, drop=True)
+    with app.app_context():
+        start = time.perf_counter()
+        count = fill(db.engine, args.users, args.days, args.active_share)
+        print(f"{count:,} user-day rows for {args.users:,} users over {args.days} days "
+              f"(filled in {time.perf_counter() - start:.1f}s)")
+
+        first = END - timedelta(days=args.days - 1)
+        print(f"{'query':<34} {'p50 ms':>8} {'p95 ms':>8}")
+        p50, p95 = timed(lambda: usage.report(db.session, first, END), args.iterations)
+        print(f"{'all users, full range':<34} {p50:>8.2f} {p95:>8.2f}")
+        p50, p95 = timed(lambda: usage.report(db.session, first, END, random.randint(1, args.users)),
+                         args.iterations)
+        print(f"{'one user, full range':<34} {p50:>8.2f} {p95:>8.2f}")
+        p50, p95 = timed(lambda: usage.report(db.session, END - timedelta(days=29), END,
+                                              random.randint(1, args.users)), args.iterations)
+        print(f"{'one user, last 30 days':<34} {p50:>8.2f} {p95:>8.2f}")
+
+        def record():
+            with db.engine.begin() as conn:
+                usage.record(conn, random.randint(1, args.users), tokens_charged=1)
+
+        p50, p95 = timed(record, args.iterations)
+        print(f"{'usage.record (upsert pair + commit)':<34} {p50:>8.2f} {p95:>8.2f}")
+        db.session.remove()
+        db.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--active-share", type=float, default=0.3, help="share of days each user is active")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--database-url", help="use this database (tables are dropped!) instead of a temp SQLite file")
+    args = parser.parse_args()
+
+    random.seed(7)
+    if args.database_url:
+        run(args.database_url, args)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        run(f"sqlite:///{os.path.join(tmp, 'bench.db')}", args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Row validation throughput (app/validation.py) on large payloads.
+
+Validates --rows parsed rows of the "location" form from forms.json with the
+compiled FormValidator and with a straightforward per-row loop over the
+form's field specs (what validating without compilation looks like).
+Payloads are run all-valid and with --invalid-share bad rows. parse_rows()
+on the same payload is timed too, for scale.
+
+    python benchmarks/bench_validation.py --rows 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.exports import parse_rows  # noqa: E402
+from app.validation import FormValidator  # noqa: E402
+
+FORMS_JSON = os.path.join(os.path.dirname(__file__), "..", "..", "Frontend", "config", "forms.json")
+
+
+def load_form(form_id: str) -> dict:
+    with open(FORMS_JSON, encoding="utf-8") as f:
+        return next(form for form in json.load(f)["forms"] if form["id"] == form_id)
+
+
+def make_rows(n: int, invalid_share: float):
+    rng = random.Random(42)
+    rows = []
+    for i in range(n):
+        data = {"parcelBarcode": f"P{rng.randrange(10 ** 9):010d}", "parcelLocation": f"L{rng.randrange(500):04d}"}
+        if rng.random() < invalid_share:
+            data[rng.choice(list(data))] = rng.choice(["", "   ", "x" * 150])
+        rows.append({"id": f"s{i}", "form_id": "location", "scanned_at": "2025-01-01T00:00:00Z",
+                     "data": json.dumps(data)})
+    return rows
+
+
+def naive_validate(rows: list, form: dict):
+    """Per-row loop reading the field specs each time."""
+    valid, errors = [], []
+    for row in rows:
+        row_errors = {}
+        for field in form["fields"]:
+            value = row.get(field["id"])
+            text = "" if value is None else str(value).strip()
+            if field.get("required") and not text:
+                row_errors[field["id"]] = "required"
+            elif isinstance(field.get("minLength"), int) and len(text) < field["minLength"]:
+                row_errors[field["id"]] = "too_short"
+            elif isinstance(field.get("maxLength"), int) and len(text) > field["maxLength"]:
+                row_errors[field["id"]] = "too_long"
+        if row_errors:
+            errors.append({"id": row.get("id"), "errors": row_errors})
+        else:
+            valid.append(row)
+    return valid, errors
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--invalid-share", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    form = load_form("location")
+    start = time.perf_counter()
+    validator = FormValidator(form)
+    compile_us = (time.perf_counter() - start) * 1e6
+    print(f"{args.rows:,} rows, form 'location' ({len(validator.checks)} checks, compiled in {compile_us:.0f} us)")
+    print(f"{'payload':<12} {'method':<22} {'ms':>8} {'rows/s':>12} {'invalid':>8}")
+
+    for label, share in (("all valid", 0.0), (f"{args.invalid_share:.0%} invalid", args.invalid_share)):
+        posted = make_rows(args.rows, share)
+        rows, _ = parse_rows(posted)
+        seconds = best_of(lambda: parse_rows(posted), args.repeat)
+        print(f"{label:<12} {'parse_rows (context)':<22} {seconds * 1000:>8.1f} {args.rows / seconds:>12,.0f} {'-':>8}")
+
+        methods = (
+            ("compiled", lambda: validator.validate(rows), lambda r: (r[1] or {}).get("invalid", 0)),
+            ("naive", lambda: naive_validate(rows, form), lambda r: len(r[1])),
+        )
+        for name, fn, count_invalid in methods:
+            seconds = best_of(fn, args.repeat)
+            invalid = count_invalid(fn())
+            print(f"{label:<12} {name:<22} {seconds * 1000:>8.1f} {args.rows / seconds:>12,.0f} {invalid:>8,}")
+
+
+if __name__ == "__main__":
+    main()
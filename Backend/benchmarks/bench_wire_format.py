@@ -0,0 +1,119 @@
+"""
+Compare export payload formats: row JSON (what the app sends today) versus
+columnar JSON and columnar MessagePack. Reports body size, server-side
+decode + row-building time (app.wire / app.exports), and the whole export
+pipeline: decode, validation, duplicate rules, both CSVs and the row index.
+
+    python benchmarks/bench_wire_format.py --rows 1000 5000 50000
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.exports import apply_duplicate_rules, index_entries, parse_rows, write_csv  # noqa: E402
+from app.validation import validate_rows  # noqa: E402
+from app.wire import columnar_rows, decode_body, msgpack  # noqa: E402
+
+FIELDS = ["id", "form_id", "scanned_at", "parcelBarcode", "parcelLocation"]
+FORM = {  # as "location" in forms.json
+    "id": "location",
+    "fields": [
+        {"id": "parcelBarcode", "required": True, "minLength": 1, "maxLength": 100},
+        {"id": "parcelLocation", "required": True, "minLength": 1, "maxLength": 100},
+    ],
+    "handleDuplicateKey": "update",
+    "handleIdenticalFields": "error",
+}
+
+
+def make_scans(n: int):
+    return [
+        {
+            "id": f"{i:032x}",
+            "form_id": "location",
+            "scanned_at": f"2025-01-01T08:{i // 60 % 60:02d}:{i % 60:02d}.000Z",
+            "parcelBarcode": f"1Z999AA1{i:010d}",
+            "parcelLocation": f"A-{i % 40:02d}-{i % 7}",
+        }
+        for i in range(n)
+    ]
+
+
+def row_body(scans):
+    rows = [
+        {
+            "id": s["id"],
+            "form_id": s["form_id"],
+            "key": s["parcelBarcode"],
+            "scanned_at": s["scanned_at"],
+            "data": json.dumps({"parcelBarcode": s["parcelBarcode"], "parcelLocation": s["parcelLocation"]}),
+        }
+        for s in scans
+    ]
+    return json.dumps({"exportId": "bench", "formId": "location", "rows": rows}).encode()
+
+
+def columnar_payload(scans):
+    return {
+        "exportId": "bench",
+        "formId": "location",
+        "fields": FIELDS,
+        "columns": [[s[f] for s in scans] for f in FIELDS],
+    }
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def export_pipeline(rows, fieldnames, folder: str):
+    rows, _ = validate_rows(rows, FORM)
+    rows, _ = apply_duplicate_rules(rows, FORM)
+    write_csv(os.path.join(folder, "minimal.csv"), ["parcelBarcode", "parcelLocation"], rows)
+    write_csv(os.path.join(folder, "full.csv"), sorted(fieldnames), rows)
+    index_entries(SimpleNamespace(id=1, user_id=1), rows, ["parcelBarcode"], location_field="parcelLocation")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 5_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    print(f"{'rows':>8} {'format':>16} {'bytes':>11} {'gzip bytes':>11} {'decode ms':>10} {'export ms':>10}")
+    for n in args.rows:
+        scans = make_scans(n)
+        formats = [
+            ("rows json", row_body(scans), "application/json",
+             lambda p: parse_rows(p["rows"])),
+            ("columnar json", json.dumps(columnar_payload(scans)).encode(), "application/json",
+             columnar_rows),
+        ]
+        if msgpack is not None:
+            formats.append(("columnar msgpack", msgpack.packb(columnar_payload(scans)),
+                            "application/msgpack", columnar_rows))
+
+        for name, body, mimetype, build in formats:
+            seconds = timed(lambda: build(decode_body(body, mimetype)), args.repeat)
+            total = timed(lambda: export_pipeline(*build(decode_body(body, mimetype)), folder), args.repeat)
+            print(f"{n:>8} {name:>16} {len(body):>11,} {len(gzip.compress(body)):>11,} "
+                  f"{seconds * 1000:>10.1f} {total * 1000:>10.1f}")
+        if msgpack is None:
+            print(f"{n:>8} {'columnar msgpack':>16}  (pip install msgpack to include)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Bulk-generate realistic users, emails, exports, Stripe events and reset tokens.
+
+Rows go straight through the DB driver, not the ORM: executemany in large
+batches on SQLite (synchronous=OFF while loading) and COPY FROM STDIN on
+PostgreSQL (psycopg2 or psycopg 3). The schema comes from the models
+(db.create_all), so the tables match what the app runs against.
+
+Scale is the number of exports; the other tables are sized from it:
+
+    users              scale / 10   (export ownership is skewed to a few heavy users)
+    emails             1-3 per user, the first one active
+    exports            scale        (spread over the last year)
+    processed_events   scale        (spread over the last 90 days)
+    password_reset_tokens  scale / 10  (mix of expired, used and live)
+    export_rows        --rows-per-export per export (0 by default)
+
+    DATABASE_URL=sqlite:////tmp/scan_1m.db python benchmarks/seed_data.py --scale 1000000
+    DATABASE_URL=postgresql://scan@localhost/scan_bench python benchmarks/seed_data.py --scale 100000
+"""
+import argparse
+import csv
+import hashlib
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-jwt-secret-key-0123456789abcdef")
+os.environ["MAINTENANCE_ENABLED"] = "0"
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+BATCH = 50_000
+FORMS = ("inbound", "location")
+NOW = datetime(2025, 6, 1)
+
+
+def _users(n: int):
+    password_hash = generate_password_hash("password1")  # hashing per row would dominate
+    for i in range(1, n + 1):
+        total = random.randint(0, 500)
+        yield (i, f"user{i:07d}", password_hash, total, random.randint(0, total), 0, 0)
+
+
+def _emails(n_users: int):
+    email_id = 0
+    for user_id in range(1, n_users + 1):
+        for k in range(random.randint(1, 3)):
+            email_id += 1
+            yield (email_id, user_id, f"user{user_id:07d}.{k}@scan.test", k == 0)
+
+
+def _owner(n_users: int) -> int:
+    # Squaring a uniform draw skews ownership towards low ids: a few accounts
+    # own most exports, like a handful of busy warehouses.
+    return int(n_users * random.random() ** 2) + 1
+
+
+def _exports(owners: list):
+    start = NOW - timedelta(days=365)
+    step = timedelta(days=365) / max(len(owners), 1)
+    for i, user_id in enumerate(owners, start=1):
+        export_id = str(1_700_000_000_000 + i * 37)
+        yield (
+            i, export_id, user_id, random.choice(FORMS),
+            f"{export_id}_minimal.csv", f"{export_id}_full.csv", f"{export_id}.json",
+            True, random.randint(1, 5000), start + step * i,
+        )
+
+
+def _export_rows(owners: list, per_export: int):
+    row_id = 0
+    for export_pk, user_id in enumerate(owners, start=1):
+        location = f"LOC-{random.randint(1, 500):04d}"
+        for row_no in range(per_export):
+            row_id += 1
+            barcode = f"PCL{random.randint(0, 10 ** 9):010d}"
+            yield (row_id, export_pk, row_no, barcode, user_id, barcode, location)
+
+
+def _events(n: int):
+    start = NOW - timedelta(days=90)
+    step = timedelta(days=90) / max(n, 1)
+    for i in range(1, n + 1):
+        yield (i, f"evt_{i:024x}", start + step * i)
+
+
+def _reset_tokens(n: int, n_users: int):
+    for i in range(1, n + 1):
+        created = NOW - timedelta(minutes=random.randint(0, 60 * 24 * 60))
+        used = created + timedelta(minutes=5) if random.random() < 0.3 else None
+        yield (i, random.randint(1, n_users), hashlib.sha256(str(i).encode()).hexdigest(),
+               created + timedelta(hours=1), used, created)
+
+
+TABLES = (
+    ("users", ("id", "username", "password_hash", "tokensTotal", "tokensUsed",
+               "emails_version", "exports_version")),
+    ("emails", ("id", "user_id", "email", "is_active")),
+    ("exports", ("id", "export_id", "user_id", "form_id", "minimal_csv", "full_csv",
+                 "payload_json", "email_sent", "row_count", "created_at")),
+    ("export_rows", ("id", "export_pk", "row_no", "row_key", "user_id", "barcode", "location")),
+    ("processed_events", ("id", "event_id", "created_at")),
+    ("password_reset_tokens", ("id", "user_id", "token_hash", "expires_at", "used_at", "created_at")),
+)
+
+
+def _chunks(rows, size: int = BATCH):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _load_sqlite(raw, table: str, columns: tuple, rows) -> int:
+    cursor = raw.cursor()
+    sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+    count = 0
+    for chunk in _chunks(rows):
+        # Same text format SQLAlchemy's SQLite DateTime writes and compares against
+        chunk = [
+            tuple(v.strftime("%Y-%m-%d %H:%M:%S.%f") if isinstance(v, datetime) else v for v in row)
+            for row in chunk
+        ]
+        cursor.executemany(sql, chunk)
+        count += len(chunk)
+    return count
+
+
+def _load_postgres(raw, table: str, columns: tuple, rows) -> int:
+    cursor = raw.cursor()
+    cols = ", ".join(f'"{c}"' for c in columns)
+    sql = f"COPY {table} ({cols}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    count = 0
+    for chunk in _chunks(rows):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for row in chunk:
+            writer.writerow("\\N" if v is None else v for v in row)
+        buf.seek(0)
+        if hasattr(cursor, "copy_expert"):  # psycopg2
+            cursor.copy_expert(sql, buf)
+        else:  # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buf.getvalue())
+        count += len(chunk)
+    if "id" in columns:
+        # COPY bypasses the sequence; move it past the ids we wrote.
+        cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                       f"(SELECT COALESCE(MAX(id), 1) FROM {table}))")
+    return count
+
+
+def seed(engine, scale: int, rows_per_export: int = 0, seed_value: int = 42) -> dict:
+    """Fill empty tables at `scale`; returns {table: (rows, seconds)}."""
+    random.seed(seed_value)
+    n_users = max(1, scale // 10)
+    owners = [_owner(n_users) for _ in range(scale)]
+    generators = {
+        "users": _users(n_users),
+        "emails": _emails(n_users),
+        "exports": _exports(owners),
+        "export_rows": _export_rows(owners, rows_per_export) if rows_per_export else iter(()),
+        "processed_events": _events(scale),
+        "password_reset_tokens": _reset_tokens(max(1, scale // 10), n_users),
+    }
+
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        load = _load_sqlite
+    elif dialect == "postgresql":
+        load = _load_postgres
+    else:
+        raise SystemExit(f"Unsupported database: {dialect}")
+
+    raw = engine.raw_connection()
+    stats = {}
+    try:
+        if dialect == "sqlite":
+            raw.execute("PRAGMA synchronous = OFF")
+        for table, columns in TABLES:
+            start = time.perf_counter()
+            count = load(raw, table, columns, generators[table])
+            stats[table] = (count, time.perf_counter() - start)
+        raw.commit()
+        if dialect == "sqlite":
+            raw.execute("ANALYZE")
+        else:
+            raw.cursor().execute("ANALYZE")
+            raw.commit()
+    finally:
+        raw.close()
+    return stats
+
+
+def create_schema(database_url: str, drop: bool = False):
+    """Build the app against database_url and create the model tables; returns the app."""
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["DB_READ_ROUTING"] = "0"
+    from app import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        if drop:
+            db.drop_all()
+        db.create_all()
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=100_000, help="number of exports")
+    parser.add_argument("--rows-per-export", type=int, default=0, help="export_rows per export")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--drop", action="store_true", help="drop and recreate the tables first")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("set DATABASE_URL or --database-url (refusing to seed instance/app.db)")
+
+    from app import db
+
+    app = create_schema(args.database_url, drop=args.drop)
+    with app.app_context():
+        stats = seed(db.engine, args.scale, args.rows_per_export)
+    for table, (count, seconds) in stats.items():
+        rate = count / seconds if seconds else 0
+        print(f"{table:<22} {count:>10,} rows {seconds:>7.2f}s {rate:>12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Delta exports (app/exports.py apply_delta) against a temporary SQLite database.
+
+    cd Backend && python -m pytest tests
+"""
+import csv
+import os
+
+import pytest
+
+from app.exports import (
+    apply_delta,
+    drop_backups,
+    publish_staged,
+    restore_published,
+    write_csv,
+    write_csv_parallel,
+)
+
+LEGACY_ROWS = [
+    {"parcelBarcode": "-5", "parcelLocation": "L1"},
+    {"parcelBarcode": "=SUM(A1)", "parcelLocation": "L2"},
+    {"parcelBarcode": "P1", "parcelLocation": "L3"},
+]
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv("SECRET_KEY", "test")
+    monkeypatch.setenv("JWT_SECRET_KEY", "test-jwt-secret-key-0123456789abcdef")
+    from app import create_app, db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def legacy_export(app, tmp_path):
+    """An export written before export_rows existed: files on disk, row_count 0, no index."""
+    from app import db
+    from app.models import Export, User
+
+    user = User(username="legacy", password_hash="x")
+    db.session.add(user)
+    db.session.flush()
+    export = Export(export_id="legacy", user_id=user.id, minimal_csv="legacy_minimal.csv",
+                    full_csv="legacy_full.csv", payload_json="legacy.json")
+    db.session.add(export)
+    db.session.commit()
+    write_csv(str(tmp_path / export.minimal_csv), ["parcelBarcode"], LEGACY_ROWS)
+    write_csv(str(tmp_path / export.full_csv), ["parcelBarcode", "parcelLocation"], LEGACY_ROWS)
+    return export
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.mark.parametrize("barcode", ["-5", "=SUM(A1)"])
+def test_delta_on_legacy_export_updates_formula_prefixed_key(tmp_path, legacy_export, barcode):
+    delta = apply_delta(str(tmp_path), legacy_export, [{"parcelBarcode": barcode, "parcelLocation": "L9"}],
+                        {"parcelBarcode", "parcelLocation"}, ["parcelBarcode"], on_duplicate="update",
+                        location_field="parcelLocation")
+    assert (delta["appended"], delta["updated"], delta["row_count"]) == (0, 1, 3)
+
+    staged_full = next(staged for staged, final in delta["staged"] if final.endswith("_full.csv"))
+    rows = read_rows(staged_full)
+    assert [r["parcelBarcode"] for r in rows] == ["'-5", "'=SUM(A1)", "P1"]
+    assert [r["parcelLocation"] for r in rows if r["parcelBarcode"] == "'" + barcode] == ["L9"]
+
+
+def test_delta_on_legacy_export_rejects_formula_prefixed_duplicate(tmp_path, legacy_export):
+    with pytest.raises(ValueError, match="already in base export"):
+        apply_delta(str(tmp_path), legacy_export, [{"parcelBarcode": "-5", "parcelLocation": "L9"}],
+                    {"parcelBarcode", "parcelLocation"}, ["parcelBarcode"], on_duplicate="error")
+    assert not any(name.endswith(".staged") for name in os.listdir(tmp_path))
+
+
+def test_restore_published_puts_the_old_files_back(tmp_path, legacy_export):
+    delta = apply_delta(str(tmp_path), legacy_export, [{"parcelBarcode": "P2", "parcelLocation": "L4"}],
+                        {"parcelBarcode", "parcelLocation"}, ["parcelBarcode"])
+    full = str(tmp_path / legacy_export.full_csv)
+    before = read_rows(full)
+
+    backups = publish_staged(delta["staged"])
+    assert len(read_rows(full)) == 4
+    restore_published(backups)  # e.g. the index commit failed
+    assert read_rows(full) == before
+    drop_backups(backups)
+    assert not any(name.endswith((".staged", ".bak")) for name in os.listdir(tmp_path))
+
+
+@pytest.mark.parametrize("minimal", [["parcelBarcode", "unknown"], ["note"]])
+def test_parallel_render_matches_serial(tmp_path, minimal):
+    rows = [
+        {"parcelBarcode": "=1+1", "qty": 3, "note": None},
+        {"parcelBarcode": "P2", "checked": True, "extra": {"a": [1, 2]}},
+        {"qty": 1.5, "note": "line1\nline2"},
+    ] * 5
+    full = ["checked", "extra", "note", "parcelBarcode", "qty"]
+    outputs = [(str(tmp_path / "minimal.csv"), minimal), (str(tmp_path / "full.csv"), full)]
+    write_csv_parallel(outputs, rows, processes=2)
+    for path, fieldnames in outputs:
+        write_csv(path + ".ref", fieldnames, rows)
+        with open(path, "rb") as got, open(path + ".ref", "rb") as want:
+            assert got.read() == want.read()
+    assert sorted(os.listdir(tmp_path)) == ["full.csv", "full.csv.ref", "minimal.csv", "minimal.csv.ref"]
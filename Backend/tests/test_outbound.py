@@ -0,0 +1,140 @@
+"""
+app/outbound.py against a local stand-in server (no network).
+
+    cd Backend && python -m pytest tests
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app import outbound
+from app.outbound import CircuitBreaker, CircuitOpenError, Provider, RetryBudget
+
+wait = time.sleep  # the fixture below stubs time.sleep for the retry backoff
+
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    wbufsize = 64 * 1024  # one write per response (avoids Nagle stalls on keep-alive)
+    mode = "ok"
+    hits = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        StandIn.hits += 1
+        if StandIn.mode == "fail":
+            self._reply(503, {"error": "unavailable"})
+        elif StandIn.mode == "broken_body":
+            # Announces a chunked body, then sends garbage: ChunkedEncodingError
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(b"zz\r\nnot a chunk")
+            self.wfile.flush()
+            self.close_connection = True
+        else:
+            self._reply(200, {"id": "ok"})
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def stand_in(monkeypatch):
+    StandIn.mode, StandIn.hits = "ok", 0
+    monkeypatch.setattr(outbound.time, "sleep", lambda seconds: None)  # no retry backoff in tests
+    return StandIn
+
+
+def make_provider(threshold=3, reset_seconds=60.0, max_retries=0, ratio=0.1, burst=10.0):
+    return Provider("test", connect_timeout=1, read_timeout=1, max_retries=max_retries, pool_size=4,
+                    breaker=CircuitBreaker(threshold, reset_seconds), budget=RetryBudget(ratio, burst))
+
+
+def test_breaker_opens_after_threshold_and_fails_fast(server_url, stand_in):
+    provider = make_provider(threshold=3)
+    stand_in.mode = "fail"
+    for _ in range(3):
+        assert provider.send("POST", server_url).status_code == 503
+    assert provider.state()["state"] == "open"
+
+    start = time.perf_counter()
+    for _ in range(20):
+        with pytest.raises(CircuitOpenError):
+            provider.send("POST", server_url)
+    assert (time.perf_counter() - start) / 20 < 0.005
+    assert stand_in.hits == 3  # rejected calls never reach the server
+    assert provider.state()["rejected"] == 20
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success(server_url, stand_in):
+    provider = make_provider(threshold=1, reset_seconds=0.05)
+    stand_in.mode = "fail"
+    provider.send("POST", server_url)
+    assert provider.state()["state"] == "open"
+
+    wait(0.06)
+    provider.breaker.before_call()  # the probe, still in flight
+    assert provider.state()["state"] == "half_open"
+    with pytest.raises(CircuitOpenError):
+        provider.send("POST", server_url)  # a second caller is rejected meanwhile
+    provider.breaker.record_success()
+
+    stand_in.mode = "ok"
+    assert provider.send("POST", server_url).status_code == 200
+    assert provider.state()["state"] == "closed"
+
+
+def test_failed_probe_reopens_instead_of_sticking_half_open(server_url, stand_in):
+    provider = make_provider(threshold=1, reset_seconds=0.05)
+    stand_in.mode = "fail"
+    provider.send("POST", server_url)
+
+    wait(0.06)
+    stand_in.mode = "broken_body"
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        provider.send("POST", server_url)  # the probe fails with a non-connection error
+    assert provider.state()["state"] == "open"
+
+    wait(0.06)
+    stand_in.mode = "ok"
+    assert provider.send("POST", server_url).status_code == 200  # next probe is allowed
+    assert provider.state()["state"] == "closed"
+
+
+def test_retry_budget_limits_retries(server_url, stand_in):
+    # Idempotent 503s would be retried 3 times each, but the budget holds 2 retries
+    provider = make_provider(threshold=100, max_retries=3, ratio=0.0, burst=2.0)
+    stand_in.mode = "fail"
+    for _ in range(5):
+        assert provider.send("POST", server_url, idempotent=True).status_code == 503
+    assert stand_in.hits == 5 + 2
+    assert provider.state()["retry_budget"] == 0
+
+
+def test_non_idempotent_calls_are_not_retried_on_5xx(server_url, stand_in):
+    provider = make_provider(threshold=100, max_retries=3)
+    stand_in.mode = "fail"
+    assert provider.send("POST", server_url).status_code == 503
+    assert stand_in.hits == 1